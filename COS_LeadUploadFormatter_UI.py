@@ -1,27 +1,5 @@
-import subprocess
-import sys
-
-def install(package):
-    subprocess.check_call([sys.executable, "-m", "pip", "install", package])
-
-# Check and install required packages
-try:
-    import streamlit as st
-except ImportError:
-    install('streamlit')
-    import streamlit as st
-
-try:
-    import pandas as pd
-except ImportError:
-    install('pandas')
-    import pandas as pd
-
-try:
-    from openpyxl import Workbook
-except ImportError:
-    install('openpyxl')
-    from openpyxl import Workbook
+import pandas as pd
+import streamlit as st
 
 import re
 from io import BytesIO
@@ -1,55 +1,108 @@
-import csv
-import re
-import openpyxl
-
-def is_valid_email(email):
-    email_regex = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(email_regex, email) is not None
-
-def is_valid_phone_number(phone_number):
-    phone_regex = r'^(?:\+?1[-. ]?)?(\d{3}|\(\d{3}\))[-. ]?\d{3}[-. ]?\d{4}$'
-    return re.match(phone_regex, phone_number) is not None
-
-def process_csv(input_file, output_file):
-    with open(input_file, 'r') as infile, open(output_file, 'w', newline='') as outfile:
-        reader = csv.reader(infile)
-        writer = csv.writer(outfile)
-
-        header = next(reader)
-        writer.writerow(header)
-
-        for row in reader:
-            if reader.line_num == 2:
-                writer.writerow(row)
-                continue
-
-            col_b = row[1].strip()
-            col_c = row[2].strip()
-            col_d = row[3].strip()
-            col_i = row[8].strip()
-            col_j = row[9].strip()
-            col_k = row[10].strip()
-
-            if not col_b and not col_c:
-                continue
-
-            if col_d and not is_valid_email(col_d):
-                row[3] = ''
-
-            if col_i and not is_valid_phone_number(col_i):
-                row[8] = ''
-
-            if col_j and not is_valid_phone_number(col_j):
-                row[9] = ''
-
-            if col_k and not is_valid_phone_number(col_k):
-                row[10] = ''
-
-            if not (col_d or col_i or col_j or col_k):
-                continue
-
-            writer.writerow(row)
-
-input_file = 'test.csv'
-output_file = 'output244544.csv'
-process_csv(input_file, output_file)
+import argparse
+import csv
+import re
+import sys
+
+from leadSchema import compile_plan
+
+def is_valid_email(email):
+    email_regex = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+    return re.match(email_regex, email) is not None
+
+def is_valid_phone_number(phone_number):
+    phone_regex = r'^(?:\+?1[-. ]?)?(\d{3}|\(\d{3}\))[-. ]?\d{3}[-. ]?\d{4}$'
+    return re.match(phone_regex, phone_number) is not None
+
+def process_csv(input_file, output_file):
+    with open(input_file, 'r') as infile, open(output_file, 'w', newline='') as outfile:
+        reader = csv.reader(infile)
+        writer = csv.writer(outfile)
+
+        header = next(reader, None)
+        if header is None:
+            raise ValueError("No columns to parse from file")
+        # Columns are found by name (or alias, e.g. 'Cell') once, not by position
+        plan = compile_plan(header)
+        writer.writerow(list(plan.header))
+        width, first, last = plan.width, plan.first, plan.last
+        contacts = ((plan.email, is_valid_email),) if plan.email is not None else ()
+        contacts += tuple((i, is_valid_phone_number) for i in plan.phones)
+
+        for row in reader:
+            if reader.line_num == 2:
+                writer.writerow(row)
+                continue
+            # Short rows (and blank lines) are padded with empty cells
+            if len(row) < width:
+                row += [''] * (width - len(row))
+
+            if not row[first].strip() and not row[last].strip():
+                continue
+
+            has_contact = False
+            for i, is_valid in contacts:
+                value = row[i].strip()
+                if value:
+                    has_contact = True
+                    if not is_valid(value):
+                        row[i] = ''
+
+            if not has_contact:
+                continue
+
+            writer.writerow(row)
+
+        return reader.line_num - 1
+
+def report_progress(rows_read, rows_per_sec):
+    print(f"{rows_read:,} rows processed ({rows_per_sec:,.0f} rows/sec)", file=sys.stderr)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Remove invalid emails and phone numbers from a lead CSV.")
+    parser.add_argument('input_file', nargs='?', default='test.csv', help="CSV to read ('-' for stdin, or an XLSX or Parquet file, with --stream)")
+    parser.add_argument('output_file', nargs='?', default='output244544.csv', help="CSV to write ('-' for stdout with --stream)")
+    parser.add_argument('--stream', action='store_true',
+                        help="Apply the Streamlit app's rules in chunks, with constant memory use")
+    parser.add_argument('--removed-file', default='removed_rows.csv', help="CSV for removed rows in --stream mode")
+    parser.add_argument('--location-name', default='', help="Location Name to set on every row in --stream mode")
+    parser.add_argument('--chunk-size', type=int, default=50000, help="Rows per chunk in --stream mode")
+    parser.add_argument('--profile', action='store_true',
+                        help="Print wall time, rows and peak memory for each stage as JSON to stderr")
+    parser.add_argument('--lead-index', metavar='PATH',
+                        help="In --stream mode, remove leads already recorded in this index file, "
+                             "then record the retained ones")
+    args = parser.parse_args(argv)
+
+    if not args.profile:
+        run(parser, args)
+        return
+
+    from leadProfile import print_profile, profiling
+    with profiling() as profile:
+        run(parser, args)
+    print_profile(profile)
+
+def run(parser, args):
+    if not args.stream:
+        from leadProfile import stage
+        try:
+            with stage('Process CSV') as processed:
+                processed['rows'] = process_csv(args.input_file, args.output_file)
+        except ValueError as e:
+            parser.exit(1, f"Error: {e}\n")
+        return
+
+    from leadCleaning import stream_csv
+    lead_index = None
+    if args.lead_index:
+        from leadIndex import LeadIndex
+        lead_index = LeadIndex(args.lead_index)
+    try:
+        retained, removed = stream_csv(args.input_file, args.output_file, args.removed_file,
+                                       args.location_name, args.chunk_size, report_progress, lead_index)
+    except ValueError as e:
+        parser.exit(1, f"Error: {e}\n")
+    print(f"Processing complete. {retained} rows retained; {removed} rows removed.", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -1,59 +1,85 @@
-import csv
-import re
-import openpyxl
-
-def is_valid_email(email):
-    email_regex = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(email_regex, email) is not None
-
-def is_valid_phone_number(phone_number):
-    phone_regex = r'^(?:\+?1[-. ]?)?(\d{3}|\(\d{3}\))[-. ]?\d{3}[-. ]?\d{4}$'
-    return re.match(phone_regex, phone_number) is not None
-
-def process_csv(input_file, output_file):
-    with open(input_file, 'r') as infile:
-        reader = csv.reader(infile)
-
-        wb = openpyxl.Workbook()
-        ws = wb.active
-
-        header = next(reader)
-        ws.append(header)
-
-        for row in reader:
-            if reader.line_num == 2:
-                ws.append(row)
-                continue
-
-            col_b = row[1].strip()
-            col_c = row[2].strip()
-            col_d = row[3].strip()
-            col_i = row[8].strip()
-            col_j = row[9].strip()
-            col_k = row[10].strip()
-
-            if not col_b and not col_c:
-                continue
-
-            if col_d and not is_valid_email(col_d):
-                row[3] = ''
-
-            if col_i and not is_valid_phone_number(col_i):
-                row[8] = ''
-
-            if col_j and not is_valid_phone_number(col_j):
-                row[9] = ''
-
-            if col_k and not is_valid_phone_number(col_k):
-                row[10] = ''
-
-            if not (col_d or col_i or col_j or col_k):
-                continue
-
-            ws.append(row)
-
-        wb.save(output_file)
-
-input_file = 'test.csv'
-output_file = 'output244544.xlsx'
-process_csv(input_file, output_file)
+import argparse
+import csv
+import re
+
+from leadProfile import print_profile, profiling, stage
+from leadSchema import compile_plan
+
+def is_valid_email(email):
+    email_regex = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+    return re.match(email_regex, email) is not None
+
+def is_valid_phone_number(phone_number):
+    phone_regex = r'^(?:\+?1[-. ]?)?(\d{3}|\(\d{3}\))[-. ]?\d{3}[-. ]?\d{4}$'
+    return re.match(phone_regex, phone_number) is not None
+
+def process_csv(input_file, output_file):
+    import openpyxl
+
+    with open(input_file, 'r') as infile:
+        reader = csv.reader(infile)
+
+        # Write-only mode streams rows to disk instead of keeping every cell in memory
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet()
+
+        header = next(reader, None)
+        if header is None:
+            raise ValueError("No columns to parse from file")
+        # Columns are found by name (or alias, e.g. 'Cell') once, not by position
+        plan = compile_plan(header)
+        ws.append(list(plan.header))
+        width, first, last = plan.width, plan.first, plan.last
+        contacts = ((plan.email, is_valid_email),) if plan.email is not None else ()
+        contacts += tuple((i, is_valid_phone_number) for i in plan.phones)
+
+        for row in reader:
+            if reader.line_num == 2:
+                ws.append(row)
+                continue
+            # Short rows (and blank lines) are padded with empty cells
+            if len(row) < width:
+                row += [''] * (width - len(row))
+
+            if not row[first].strip() and not row[last].strip():
+                continue
+
+            has_contact = False
+            for i, is_valid in contacts:
+                value = row[i].strip()
+                if value:
+                    has_contact = True
+                    if not is_valid(value):
+                        row[i] = ''
+
+            if not has_contact:
+                continue
+
+            ws.append(row)
+        rows = reader.line_num - 1
+
+    with stage('Save XLSX', rows):
+        wb.save(output_file)
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Remove invalid emails and phone numbers from a lead CSV and save it as XLSX.")
+    parser.add_argument('input_file', nargs='?', default='test.csv', help="CSV to read")
+    parser.add_argument('output_file', nargs='?', default='output244544.xlsx', help="XLSX to write")
+    parser.add_argument('--profile', action='store_true',
+                        help="Print wall time, rows and peak memory for each stage as JSON to stderr")
+    args = parser.parse_args(argv)
+
+    try:
+        if not args.profile:
+            process_csv(args.input_file, args.output_file)
+            return
+
+        with profiling() as profile, stage('Process CSV') as processed:
+            processed['rows'] = process_csv(args.input_file, args.output_file)
+    except ValueError as e:
+        parser.exit(1, f"Error: {e}\n")
+    print_profile(profile)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import nullcontext
+
+from leadCleaning import CLEAN_CHUNK_ROWS, iter_cleaned_chunks
+from leadIO import OUTPUT_FORMATS, frame_writer
+from leadProfile import profiling
+
+# Lead files picked up when the input is a directory
+INPUT_EXTENSIONS = ('.csv', '.xlsx', '.parquet')
+
+# Worker processes; each cleans one file at a time
+BATCH_WORKERS = os.cpu_count() or 1
+
+SUMMARY_FILE = 'batch_summary.json'
+
+# --------------------------------------------------
+# Input Files
+# --------------------------------------------------
+
+def find_input_files(pattern: str) -> list:
+    """
+    Returns the lead files to process: every CSV, XLSX and Parquet file directly inside
+    `pattern` if it is a directory, otherwise the files matching it as a glob.
+    """
+    if os.path.isdir(pattern):
+        paths = [os.path.join(pattern, name) for name in os.listdir(pattern)
+                 if name.lower().endswith(INPUT_EXTENSIONS)]
+    else:
+        paths = glob.glob(pattern)
+    return sorted(path for path in paths if os.path.isfile(path))
+
+def output_paths(input_file: str, output_dir: str, output_format: str) -> (str, str):
+    """
+    Returns a tuple:
+        (cleaned output path, removed rows output path)
+    """
+    stem = os.path.splitext(os.path.basename(input_file))[0]
+    return (os.path.join(output_dir, f"{stem}_cleaned.{output_format}"),
+            os.path.join(output_dir, f"{stem}_removed.{output_format}"))
+
+# --------------------------------------------------
+# Workers
+# --------------------------------------------------
+
+def _init_worker() -> None:
+    # One process per core already; stop Arrow from starting a thread per core in each of them
+    import pyarrow as pa
+    pa.set_cpu_count(1)
+    pa.set_io_thread_count(1)
+
+def process_file(input_file: str, output_dir: str, location_name: str = '', output_format: str = 'xlsx',
+                 chunk_size: int = CLEAN_CHUNK_ROWS, profile: bool = False) -> dict:
+    """
+    Cleans one lead file chunk by chunk and writes its cleaned and removed-rows
+    outputs to `output_dir`. Errors are recorded in the returned summary
+    instead of raised, so one bad file does not stop the rest of the batch;
+    a failed file leaves no outputs behind.
+    With `profile`, the summary includes the file's per-stage profile.
+    """
+    output_file, removed_file = output_paths(input_file, output_dir, output_format)
+    summary = {'input_file': input_file, 'output_file': output_file, 'removed_file': removed_file,
+               'rows_read': 0, 'rows_retained': 0, 'rows_removed': 0, 'seconds': 0.0, 'error': None}
+    started = time.perf_counter()
+    with profiling() if profile else nullcontext() as file_profile:
+        try:
+            with frame_writer(output_file, output_format) as cleaned_out, \
+                    frame_writer(removed_file, output_format) as removed_out:
+                for chunk_rows, cleaned_df, removed_rows in iter_cleaned_chunks(input_file, location_name, chunk_size):
+                    cleaned_out.write(cleaned_df)
+                    removed_out.write(removed_rows)
+                    summary['rows_read'] += chunk_rows
+                    summary['rows_retained'] += len(cleaned_df)
+                    summary['rows_removed'] += len(removed_rows)
+        except Exception as e:
+            summary['error'] = str(e) or repr(e)
+            for path in (output_file, removed_file):
+                if os.path.exists(path):
+                    os.remove(path)
+    if profile:
+        summary['profile'] = file_profile.report()
+    summary['seconds'] = round(time.perf_counter() - started, 3)
+    return summary
+
+def run_batch(input_files: list, output_dir: str, location_name: str = '', output_format: str = 'xlsx',
+              chunk_size: int = CLEAN_CHUNK_ROWS, workers: int = BATCH_WORKERS, report=None,
+              profile: bool = False) -> dict:
+    """
+    Cleans `input_files` in parallel on a pool of worker processes and returns
+    the batch summary. The largest files are started first so that one big file
+    does not finish alone at the end while the other workers sit idle.
+    `report`, if given, is called with each file's summary as it finishes.
+    With `profile`, each file's summary includes its per-stage profile.
+    """
+    stems = [os.path.splitext(os.path.basename(path))[0] for path in input_files]
+    duplicates = sorted({stem for stem in stems if stems.count(stem) > 1})
+    if duplicates:
+        raise ValueError(f"Input files would overwrite each other's outputs: {', '.join(duplicates)}")
+    os.makedirs(output_dir, exist_ok=True)
+
+    started = time.perf_counter()
+    by_size = sorted(input_files, key=os.path.getsize, reverse=True)
+    workers = max(min(workers, len(input_files)), 1)
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = [pool.submit(process_file, path, output_dir, location_name, output_format, chunk_size, profile)
+                   for path in by_size]
+        for future in as_completed(futures):
+            summary = future.result()
+            results[summary['input_file']] = summary
+            if report:
+                report(summary)
+
+    files = [results[path] for path in input_files]
+    return {
+        'workers': workers,
+        'seconds': round(time.perf_counter() - started, 3),
+        'files_processed': sum(f['error'] is None for f in files),
+        'files_failed': sum(f['error'] is not None for f in files),
+        'rows_read': sum(f['rows_read'] for f in files),
+        'rows_retained': sum(f['rows_retained'] for f in files),
+        'rows_removed': sum(f['rows_removed'] for f in files),
+        'files': files,
+    }
+
+# --------------------------------------------------
+# Command Line
+# --------------------------------------------------
+
+def report_file(summary: dict) -> None:
+    if summary['error']:
+        print(f"{summary['input_file']}: failed: {summary['error']}", file=sys.stderr)
+    else:
+        print(f"{summary['input_file']}: {summary['rows_retained']:,} retained, "
+              f"{summary['rows_removed']:,} removed in {summary['seconds']:.1f}s", file=sys.stderr)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Clean a directory (or glob) of lead files in parallel, writing cleaned and "
+                    "removed-rows outputs for each file plus a JSON summary.")
+    parser.add_argument('input', help="Directory of CSV/XLSX/Parquet lead files, or a glob such as 'leads/*.csv'")
+    parser.add_argument('output_dir', help="Directory for the output files and the summary")
+    parser.add_argument('--location-name', default='', help="Location Name to set on every row")
+    parser.add_argument('--format', dest='output_format', choices=OUTPUT_FORMATS, default='xlsx',
+                        help="Output file format (default: xlsx). Parquet and Arrow IPC are much faster to "
+                             "write, for handing the results to other jobs.")
+    parser.add_argument('--workers', type=int, default=BATCH_WORKERS,
+                        help=f"Worker processes (default: {BATCH_WORKERS}, the CPU count)")
+    parser.add_argument('--chunk-size', type=int, default=CLEAN_CHUNK_ROWS, help="Rows per chunk")
+    parser.add_argument('--profile', action='store_true',
+                        help="Add wall time, rows and peak memory for each stage to every file's summary")
+    parser.add_argument('--summary', help=f"Summary JSON path (default: <output_dir>/{SUMMARY_FILE})")
+    args = parser.parse_args(argv)
+
+    input_files = find_input_files(args.input)
+    if not input_files:
+        parser.exit(1, f"Error: No lead files found for {args.input}\n")
+
+    try:
+        summary = run_batch(input_files, args.output_dir, args.location_name, args.output_format,
+                            args.chunk_size, args.workers, report=report_file, profile=args.profile)
+    except ValueError as e:
+        parser.exit(1, f"Error: {e}\n")
+
+    summary_file = args.summary or os.path.join(args.output_dir, SUMMARY_FILE)
+    with open(summary_file, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+
+    print(f"Processed {summary['files_processed']} of {len(input_files)} files "
+          f"({summary['rows_read']:,} rows) in {summary['seconds']:.1f}s with {summary['workers']} workers. "
+          f"Summary written to {summary_file}")
+    if summary['files_failed']:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from leadCleaning import clean_frame
+from leadIO import frame_to_xlsx
+from leadSynthetic import generate_leads
+from leadValidation import is_valid_email, is_valid_phone, phone_strings, valid_email_mask, valid_phone_mask
+
+BENCHMARK_SIZES = [10000, 100000, 1000000]
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+
+# A benchmark fails when it is this much slower than its baseline (0.25 = 25%)...
+SLOWDOWN_THRESHOLD = 0.25
+
+# ...and at least this many seconds slower, so timer noise on tiny runs is ignored
+NOISE_SECONDS = 0.02
+
+# Timed runs per benchmark; the fastest counts. Large sizes run once.
+REPEATS = 3
+REPEAT_MAX_ROWS = 100000
+
+# --------------------------------------------------
+# Benchmarks
+# --------------------------------------------------
+
+def _load_csv_to_csv():
+    """Imports CSV-to-CSV.py, whose file name is not a valid module name."""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'CSV-to-CSV.py')
+    spec = importlib.util.spec_from_file_location('csv_to_csv', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def benchmarks(df, csv_path: str, output_dir: str) -> list:
+    """
+    Returns (name, function) pairs for one generated DataFrame; the function
+    runs the benchmark once and returns its result.
+    """
+    emails = df['Email'].to_numpy(dtype=object)
+    phones = phone_strings(df['Mobile Phone'])
+    phone_values = phones.to_numpy(dtype=object, na_value=None)
+    cleaned, _ = clean_frame(df, 'Benchmark Club')
+    process_csv = _load_csv_to_csv().process_csv
+
+    return [
+        ('is_valid_email', lambda: np.array([is_valid_email(v) for v in emails])),
+        ('is_valid_phone', lambda: np.array([is_valid_phone(v) for v in phone_values])),
+        ('valid_email_mask', lambda: valid_email_mask(df['Email'])),
+        ('valid_phone_mask', lambda: valid_phone_mask(phones)),
+        ('clean_data', lambda: clean_frame(df, 'Benchmark Club')),
+        ('to_xlsx', lambda: frame_to_xlsx(cleaned)),
+        ('CSV-to-CSV.process_csv', lambda: process_csv(csv_path, os.path.join(output_dir, 'process_csv.csv'))),
+    ]
+
+def time_call(fn, repeats: int):
+    """Returns a tuple: (fastest wall time in seconds, result of the last call)."""
+    best = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def run_benchmarks(sizes, seed: int = 0, only=None, report=None) -> (dict, list):
+    """
+    Times every benchmark at each size on seeded synthetic data, and checks that
+    the columnar masks agree with the scalar checks they replace.
+    Returns a tuple:
+        ({'<name>@<rows>': seconds}, list of parity failure messages)
+    """
+    results, parity_failures = {}, []
+    with tempfile.TemporaryDirectory() as output_dir:
+        for rows in sizes:
+            df = generate_leads(rows, seed=seed)
+            csv_path = os.path.join(output_dir, f'leads_{rows}.csv')
+            df.to_csv(csv_path, index=False)
+
+            repeats = REPEATS if rows <= REPEAT_MAX_ROWS else 1
+            outputs = {}
+            for name, fn in benchmarks(df, csv_path, output_dir):
+                if only and name not in only:
+                    continue
+                seconds, outputs[name] = time_call(fn, repeats)
+                key = f'{name}@{rows}'
+                results[key] = seconds
+                if report:
+                    report(key, seconds, rows)
+
+            for scalar, columnar in (('is_valid_email', 'valid_email_mask'), ('is_valid_phone', 'valid_phone_mask')):
+                if scalar in outputs and columnar in outputs:
+                    mismatches = int((outputs[scalar] != outputs[columnar]).sum())
+                    if mismatches:
+                        parity_failures.append(f"{columnar}@{rows}: {mismatches} values disagree with {scalar}")
+    return results, parity_failures
+
+# --------------------------------------------------
+# Baselines
+# --------------------------------------------------
+
+def load_baseline(path: str = BASELINE_FILE) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f).get('results', {})
+
+def save_baseline(results: dict, path: str = BASELINE_FILE) -> None:
+    baseline = {
+        'machine': {'python': platform.python_version(), 'platform': platform.platform(),
+                    'processor': platform.processor(), 'cpus': os.cpu_count()},
+        'results': {key: round(seconds, 4) for key, seconds in sorted(results.items())},
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, indent=2)
+        f.write('\n')
+
+def regressions(results: dict, baseline: dict, threshold: float = SLOWDOWN_THRESHOLD) -> list:
+    """Returns a message for every benchmark slower than its baseline by more than `threshold`."""
+    failures = []
+    for key, seconds in results.items():
+        expected = baseline.get(key)
+        if expected is None:
+            continue
+        if seconds > expected * (1 + threshold) and seconds - expected > NOISE_SECONDS:
+            failures.append(f"{key}: {seconds:.3f}s vs baseline {expected:.3f}s "
+                            f"({seconds / expected - 1:+.0%}, limit +{threshold:.0%})")
+    return failures
+
+# --------------------------------------------------
+# Command Line
+# --------------------------------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the validation, cleaning and export code on synthetic lead data, "
+                    "and fail if anything got slower than the stored baseline.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=BENCHMARK_SIZES,
+                        help=f"Row counts to run (default: {' '.join(map(str, BENCHMARK_SIZES))})")
+    parser.add_argument('--only', nargs='+', metavar='NAME', help="Run only these benchmarks")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for the synthetic data")
+    parser.add_argument('--baseline', default=BASELINE_FILE, help="Baseline JSON file")
+    parser.add_argument('--threshold', type=float, default=SLOWDOWN_THRESHOLD,
+                        help=f"Allowed slowdown before failing, as a fraction (default: {SLOWDOWN_THRESHOLD})")
+    parser.add_argument('--update-baseline', action='store_true',
+                        help="Store these timings as the new baseline instead of comparing")
+    parser.add_argument('--json', metavar='PATH', help="Also write the timings to this JSON file")
+    args = parser.parse_args(argv)
+
+    baseline = load_baseline(args.baseline)
+
+    def report(key, seconds, rows):
+        expected = baseline.get(key)
+        change = f"  ({seconds / expected - 1:+.0%} vs baseline)" if expected else ""
+        print(f"{key:<36} {seconds:9.3f}s  {rows / seconds:>12,.0f} rows/sec{change}")
+
+    results, failures = run_benchmarks(args.sizes, args.seed, args.only, report)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if args.update_baseline:
+        save_baseline({**baseline, **results}, args.baseline)
+        print(f"Baseline written to {args.baseline}")
+    else:
+        failures += regressions(results, baseline, args.threshold)
+
+    if failures:
+        print("\nFAILED:", *failures, sep="\n  ", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+# Size budgets for the app's caches, in bytes
+UPLOAD_CACHE_BYTES = 512 * 1024 * 1024
+RESULT_CACHE_BYTES = 512 * 1024 * 1024
+EXPORT_CACHE_BYTES = 256 * 1024 * 1024
+
+# --------------------------------------------------
+# Keys and Sizes
+# --------------------------------------------------
+
+def content_hash(data) -> str:
+    """Returns the SHA-256 hex digest of uploaded bytes (or any buffer)."""
+    return hashlib.sha256(data).hexdigest()
+
+def frame_nbytes(*frames: pd.DataFrame) -> int:
+    """Approximate memory held by one or more DataFrames, including string data."""
+    return int(sum(frame.memory_usage(index=True, deep=True).sum() for frame in frames if frame is not None))
+
+# --------------------------------------------------
+# Cache
+# --------------------------------------------------
+
+class ContentCache:
+    """
+    Thread-safe LRU cache bounded by the total size of its values in bytes.
+    Keys are built from content hashes and settings rather than the values
+    themselves, so looking something up never hashes a DataFrame.
+    Values larger than the whole budget are returned but not stored.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0]
+
+    def put(self, key, value, nbytes: int) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._total -= self._entries.pop(key)[1]
+            if nbytes > self.max_bytes:
+                return
+            self._entries[key] = (value, nbytes)
+            self._total += nbytes
+            while self._total > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._total -= evicted
+
+    def get_or_compute(self, key, compute, sizeof=len):
+        """
+        Returns the cached value for `key`, or calls `compute()` and caches its
+        result with the size reported by `sizeof`.
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.put(key, value, sizeof(value))
+        return value
+
+    def keys(self) -> list:
+        """Returns the cached keys, most recently used last, without counting as a use of any."""
+        with self._lock:
+            return list(self._entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._total = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries),
+                    'bytes': self._total, 'max_bytes': self.max_bytes}
+
+# Shared by every session of the app for as long as the server runs
+UPLOAD_CACHE = ContentCache(UPLOAD_CACHE_BYTES)
+RESULT_CACHE = ContentCache(RESULT_CACHE_BYTES)
+EXPORT_CACHE = ContentCache(EXPORT_CACHE_BYTES)
@@ -0,0 +1,364 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from leadDomains import DomainChecker
+from leadProfile import stage
+from leadRules import (COLUMN_ALIASES, CONTACT_COLUMNS, EMAIL_TYPOS, FORBIDDEN_PREFIXES, PHONE_COLUMNS, PHONE_FORMAT,
+                       REASON_ALREADY_UPLOADED, REASON_COLUMN, REASON_EMAIL_TYPO, REASON_INVALID_EMAIL,
+                       REASON_LABELS, REASON_MISSING_NAME, REASON_NO_CONTACT, REQUIRED_COLUMNS)
+from leadSchema import compile_plan
+from leadValidation import (misspelled_emails, normalized_phones, phone_reasons, phone_strings, valid_email_mask,
+                            valid_phone_mask)
+
+# Rows cleaned at a time by clean_in_chunks
+CLEAN_CHUNK_ROWS = 50000
+
+# --------------------------------------------------
+# Cleaning Rules
+# --------------------------------------------------
+
+def _count(diagnostics: dict, key: str, n) -> None:
+    diagnostics[key] = diagnostics.get(key, 0) + int(n)
+
+def _validation_counts(diagnostics: dict, col: str):
+    # Values and distinct values validated in a column, or None without diagnostics
+    if diagnostics is None:
+        return None
+    return diagnostics.setdefault('validation', {}).setdefault(col, {'values': 0, 'distinct': 0})
+
+def reason_counts(codes) -> dict:
+    """
+    Counts the rows with each reason bit set in an array of reason codes
+    (see leadRules.REASON_LABELS). Returns a dict:
+        {label: rows}
+    """
+    codes = np.asarray(codes, dtype=np.uint8)
+    return {label: int(np.count_nonzero(codes & bit)) for bit, label in REASON_LABELS}
+
+def with_location_name(df: pd.DataFrame, location_name: str, lean: bool = False,
+                       position: int = None) -> pd.DataFrame:
+    """
+    Returns `df` with every Location Name set to `location_name`, as
+    `clean_frame` sets it: in place of the file's column, or else as a new
+    column at `position` (by default after the others; for removed rows, the
+    number of columns of the cleaned rows, so it lands before the Removal
+    Reason). Only that one column is written and the others are shared with
+    `df`, so a new Location Name never means cleaning the rows again. With
+    `lean`, the column is a categorical. An empty name returns `df` as is.
+    """
+    if not location_name:
+        return df
+    df = df.copy(deep=False)
+    if lean:
+        value = pd.Categorical.from_codes(np.zeros(len(df), dtype=np.int8), [location_name])
+    else:
+        value = location_name
+    if 'Location Name' in df.columns or position is None:
+        df['Location Name'] = value
+    else:
+        df.insert(position, 'Location Name', value)
+    return df
+
+def clean_frame(df: pd.DataFrame, location_name: str, lead_index=None, diagnostics: dict = None,
+                lean: bool = False, domain_checker: DomainChecker = None) -> (pd.DataFrame, pd.DataFrame):
+    """
+    Applies the Mass Lead Upload rules to a DataFrame:
+      - Renaming columns found under another name (e.g. 'Cell', 'e-mail') to
+        the standard names (see leadSchema.column_renames)
+      - Adding the Location Name (if provided)
+      - Removing rows with missing 'First Name' or 'Last Name'
+      - Converting phone columns to strings for uniform validation
+      - Validating emails and phone numbers (invalid ones become None), and
+        writing valid phone numbers in leadRules.PHONE_FORMAT
+      - Flagging, removing or correcting emails whose domain looks misspelled,
+        as leadRules.EMAIL_TYPOS says, using `domain_checker` (a
+        leadDomains.DomainChecker; pass the same one for every chunk of an
+        upload so each domain is checked once)
+      - Removing rows that have no valid contact information
+      - Removing leads already in `lead_index` (a leadIndex.LeadIndex), if given
+    Each rule sets its bit (see leadRules.REASON_LABELS) in a reason code per
+    row, and the removed rows get the codes as a uint8 'Removal Reason' column;
+    the writers in leadIO turn them into text. Rows missing a name are dropped
+    and only counted.
+    The input DataFrame is not modified. If `diagnostics` is a dict, the counts
+    described in `clean_leads` are added to it.
+
+    With `lean`, the Location Name is stored as a categorical, and the rows are
+    reordered once (retained rows first) and split into two slices of that one
+    frame instead of being copied twice (see `clean_leads`).
+    Returns a tuple:
+        (cleaned DataFrame, DataFrame of removed rows)
+    Raises ValueError if a required column is missing.
+    """
+    # Columns are replaced below rather than written into, so a shallow copy
+    # keeps the caller's frame unchanged without copying any data
+    df = df.copy(deep=False)
+
+    # Give aliased columns their standard names; this also verifies the
+    # required columns exist
+    renames = compile_plan(df.columns).renames
+    if renames:
+        df = df.rename(columns=renames)
+
+    # Set Location Name if provided
+    df = with_location_name(df, location_name, lean)
+
+    # Remove rows missing First or Last Name. Lean mode keeps them until the
+    # final split rather than copying the frame here.
+    rows_in = len(df)
+    with stage('Name filter', len(df)):
+        named = (df['First Name'].notnull() & df['Last Name'].notnull()).to_numpy()
+        rows_named = int(named.sum())
+        if not lean:
+            df = df[named]
+            named = np.ones(len(df), dtype=bool)
+        codes = np.zeros(len(df), dtype=np.uint8)
+
+    # Process phone columns: ensure they are strings
+    with stage('Phone string conversion', len(df)):
+        for col in PHONE_COLUMNS:
+            if col in df.columns:
+                df[col] = phone_strings(df[col])
+
+    # Validate email and phone columns a whole column at a time
+    with stage('Email validation', len(df)):
+        if 'Email' in df.columns:
+            valid = valid_email_mask(df['Email'], _validation_counts(diagnostics, 'Email'))
+            invalid = df['Email'].notnull().to_numpy() & ~valid & named
+            codes[invalid] |= REASON_INVALID_EMAIL
+            emails = df['Email'].where(valid, None)
+            typos, found = np.zeros(0, dtype=np.int64), {}
+            if EMAIL_TYPOS != 'ignore':
+                typos, corrected, found = misspelled_emails(emails, domain_checker or DomainChecker())
+                if EMAIL_TYPOS == 'correct':
+                    emails.iloc[typos] = corrected
+                elif EMAIL_TYPOS == 'remove':
+                    typos = typos[named[typos]]
+                    codes[typos] |= REASON_EMAIL_TYPO
+                    emails.iloc[typos] = None
+            if diagnostics is not None:
+                blanked = invalid.sum() + (len(typos) if EMAIL_TYPOS == 'remove' else 0)
+                _count(diagnostics.setdefault('invalid_values', {}), 'Email', blanked)
+                diagnostics.setdefault('email_typos', {}).update(found)
+            df['Email'] = emails
+    with stage('Phone validation', len(df)):
+        for col in PHONE_COLUMNS:
+            if col in df.columns:
+                valid = valid_phone_mask(df[col], _validation_counts(diagnostics, col))
+                invalid = np.flatnonzero(df[col].notnull().to_numpy() & ~valid & named)
+                # Only the rejected numbers are checked again, to tell why they were rejected
+                if len(invalid):
+                    codes[invalid] |= phone_reasons(df[col].iloc[invalid])
+                if diagnostics is not None:
+                    _count(diagnostics.setdefault('invalid_values', {}), col, len(invalid))
+                df[col] = normalized_phones(df[col], valid)
+
+    # Identify rows with at least one valid contact info (Email or any Phone)
+    with stage('Contact mask', len(df)):
+        existing_contact_cols = [col for col in CONTACT_COLUMNS if col in df.columns]
+        valid_mask = df[existing_contact_cols].notnull().any(axis=1) & named
+        removed_mask = ~valid_mask & named
+        codes[removed_mask.to_numpy()] |= REASON_NO_CONTACT
+
+    # Check the remaining leads against previous uploads
+    if lead_index is not None:
+        with stage('Duplicate check', int(valid_mask.sum())):
+            duplicate_mask = pd.Series(False, index=df.index)
+            duplicate_mask[valid_mask] = lead_index.duplicate_mask(df[valid_mask])
+            valid_mask &= ~duplicate_mask
+            removed_mask |= duplicate_mask
+            codes[duplicate_mask.to_numpy()] |= REASON_ALREADY_UPLOADED
+
+    with stage('Split rows', len(df)):
+        if lean:
+            kept, dropped = np.flatnonzero(valid_mask), np.flatnonzero(removed_mask)
+            ordered = df.take(np.concatenate([kept, dropped]))
+            cleaned_df, removed_rows = ordered.iloc[:len(kept)], ordered.iloc[len(kept):]
+            removed_rows = removed_rows.assign(**{REASON_COLUMN: codes[dropped]})
+        else:
+            removed_rows = df[removed_mask].copy()
+            cleaned_df = df[valid_mask].copy()
+            removed_rows[REASON_COLUMN] = codes[removed_mask.to_numpy()]
+
+    if diagnostics is not None:
+        _count(diagnostics, 'rows_read', rows_in)
+        _count(diagnostics, 'missing_name', rows_in - rows_named)
+        _count(diagnostics, 'rows_retained', len(cleaned_df))
+        _count(diagnostics, 'rows_removed', len(removed_rows))
+        duplicates = int(duplicate_mask.sum()) if lead_index is not None else 0
+        _count(diagnostics, 'no_contact', len(removed_rows) - duplicates)
+        _count(diagnostics, 'already_uploaded', duplicates)
+        # Rows without a name are dropped rather than removed, so only the count has their bit
+        counts = reason_counts(codes[removed_mask.to_numpy()])
+        counts[dict(REASON_LABELS)[REASON_MISSING_NAME]] = rows_in - rows_named
+        for label, rows in counts.items():
+            _count(diagnostics.setdefault('reasons', {}), label, rows)
+    return cleaned_df, removed_rows
+
+def clean_in_chunks(df: pd.DataFrame, location_name: str, chunk_rows: int = CLEAN_CHUNK_ROWS,
+                    progress=None, lead_index=None, diagnostics: dict = None) -> (pd.DataFrame, pd.DataFrame):
+    """
+    Applies `clean_frame` to `chunk_rows` rows at a time and joins the results.
+    The rules only ever look at one row, so the output matches a single call;
+    `progress`, if given, is called with the number of rows cleaned so far.
+    """
+    domain_checker = DomainChecker()
+    if len(df) <= chunk_rows:
+        result = clean_frame(df, location_name, lead_index, diagnostics, domain_checker=domain_checker)
+        if progress:
+            progress(len(df))
+        return result
+
+    cleaned_parts, removed_parts = [], []
+    for start in range(0, len(df), chunk_rows):
+        cleaned_df, removed_rows = clean_frame(df.iloc[start:start + chunk_rows], location_name, lead_index,
+                                               diagnostics, domain_checker=domain_checker)
+        cleaned_parts.append(cleaned_df)
+        removed_parts.append(removed_rows)
+        if progress:
+            progress(min(start + chunk_rows, len(df)))
+    return pd.concat(cleaned_parts), pd.concat(removed_parts)
+
+def rule_settings() -> tuple:
+    """
+    Returns the settings the cleaning rules depend on, for use in cache keys.
+    """
+    return (tuple(REQUIRED_COLUMNS), tuple(PHONE_COLUMNS), FORBIDDEN_PREFIXES, PHONE_FORMAT, EMAIL_TYPOS,
+            tuple(sorted(COLUMN_ALIASES.items())))
+
+# --------------------------------------------------
+# Headless API
+# --------------------------------------------------
+
+def clean_leads(data, location_name: str = '', lead_index=None, lean: bool = False,
+                progress=None) -> (pd.DataFrame, pd.DataFrame, dict):
+    """
+    Applies the Mass Lead Upload rules without any UI, for workers, services
+    and scripts. `data` is a DataFrame or an iterable of DataFrame chunks (e.g.
+    pd.read_csv(..., chunksize=...)); chunks are cleaned one at a time.
+    `progress`, if given, is called with the number of rows cleaned so far.
+
+    With `lean`, see `clean_frame`; the chunks are best read with
+    `leadIO.iter_lean_chunks`, so the whole input is never held in memory and
+    only the (compact) results grow with the file.
+
+    No state is shared between calls apart from `lead_index`, which is
+    locked, so calls can run in many threads or processes at once.
+    Returns a tuple:
+        (cleaned DataFrame, DataFrame of removed rows, diagnostics dict)
+    where diagnostics has:
+        rows_read, rows_retained, rows_removed - row counts
+        missing_name - rows dropped for a missing First or Last Name
+        no_contact, already_uploaded - removed rows by reason
+        invalid_values - {column: invalid emails / phone numbers blanked}
+        validation - {column: {'values': non-missing values, 'distinct': values
+                     actually validated}}; each distinct value is checked once
+        email_typos - {misspelled email domain: suggested domain}
+        reasons - {reason label: rows removed or dropped with that reason bit set}
+        missing_columns - contact columns the input does not have
+        chunks - number of chunks cleaned
+    Raises ValueError if a required column is missing.
+    """
+    chunks = [data] if isinstance(data, pd.DataFrame) else data
+    diagnostics = {'rows_read': 0, 'rows_retained': 0, 'rows_removed': 0, 'missing_name': 0,
+                   'no_contact': 0, 'already_uploaded': 0, 'invalid_values': {}, 'validation': {}, 'email_typos': {},
+                   'reasons': {label: 0 for _, label in REASON_LABELS}, 'missing_columns': [], 'chunks': 0}
+    cleaned_parts, removed_parts = [], []
+    domain_checker = DomainChecker()
+    for chunk in chunks:
+        if not diagnostics['chunks']:
+            header = compile_plan(chunk.columns).header
+            diagnostics['missing_columns'] = [col for col in CONTACT_COLUMNS if col not in header]
+        cleaned_df, removed_rows = clean_frame(chunk, location_name, lead_index, diagnostics, lean, domain_checker)
+        cleaned_parts.append(cleaned_df)
+        removed_parts.append(removed_rows)
+        diagnostics['chunks'] += 1
+        if progress:
+            progress(diagnostics['rows_read'])
+
+    if not cleaned_parts:
+        return pd.DataFrame(), pd.DataFrame(), diagnostics
+    if len(cleaned_parts) == 1:
+        return cleaned_parts[0], removed_parts[0], diagnostics
+    if lean:
+        from leadIO import concat_frames
+        return concat_frames(cleaned_parts), concat_frames(removed_parts), diagnostics
+    return pd.concat(cleaned_parts), pd.concat(removed_parts), diagnostics
+
+# --------------------------------------------------
+# Streaming
+# --------------------------------------------------
+
+def iter_cleaned_chunks(input_file: str, location_name: str = '', chunk_size: int = CLEAN_CHUNK_ROWS,
+                        lead_index=None):
+    """
+    Reads a CSV ('-' for stdin), XLSX or Parquet file in chunks (see
+    leadIO.iter_input_chunks) and applies `clean_frame` to each. Yields tuples:
+        (rows read in the chunk, cleaned DataFrame, DataFrame of removed rows)
+
+    Every CSV column is read as text: chunks are parsed independently, so letting
+    pandas infer types could turn a phone column into floats in some chunks only.
+    """
+    from leadIO import iter_input_chunks
+    reader = iter_input_chunks(input_file, chunk_rows=chunk_size)
+    domain_checker = DomainChecker()
+
+    while True:
+        with stage('Read input') as read:
+            chunk = next(reader, None)
+            read['rows'] = 0 if chunk is None else len(chunk)
+        if chunk is None:
+            break
+        cleaned_df, removed_rows = clean_frame(chunk, location_name, lead_index, domain_checker=domain_checker)
+        yield len(chunk), cleaned_df, removed_rows
+
+def stream_file(input_file: str, output_file: str, removed_file: str, location_name: str = '',
+                chunk_size: int = CLEAN_CHUNK_ROWS, report=None, lead_index=None,
+                output_format: str = 'csv') -> (int, int):
+    """
+    Applies `clean_frame` to a CSV, XLSX or Parquet file one chunk at a time
+    (see `iter_cleaned_chunks`), appending each chunk to the cleaned and
+    removed-rows outputs, so memory use does not grow with the file.
+    `output_format` is one of leadIO.OUTPUT_FORMATS. '-' reads from stdin or
+    writes CSV to stdout.
+
+    `report`, if given, is called after each chunk with (rows read, rows/sec).
+    With a `lead_index`, rows already in it are removed, and the retained leads
+    are added to it once the whole file has been written.
+    Returns a tuple:
+        (rows retained, rows removed)
+    """
+    from leadIO import frame_writer
+    if output_file == '-' and removed_file == '-':
+        raise ValueError("Only one of the outputs can be written to stdout")
+
+    retained = removed = rows_read = 0
+    new_keys = []
+    started = time.perf_counter()
+    with frame_writer(output_file, output_format) as cleaned_out, \
+            frame_writer(removed_file, output_format) as removed_out:
+        for chunk_rows, cleaned_df, removed_rows in iter_cleaned_chunks(input_file, location_name, chunk_size,
+                                                                        lead_index):
+            cleaned_out.write(cleaned_df)
+            removed_out.write(removed_rows)
+            if lead_index is not None:
+                new_keys.append(lead_index.keys(cleaned_df))
+
+            rows_read += chunk_rows
+            retained += len(cleaned_df)
+            removed += len(removed_rows)
+            if report:
+                elapsed = time.perf_counter() - started
+                report(rows_read, rows_read / elapsed if elapsed else 0.0)
+
+    # Recorded only now, so leads repeated within the file are not reported as earlier uploads
+    if new_keys:
+        lead_index.add(np.concatenate(new_keys))
+    return retained, removed
+
+def stream_csv(input_file: str, output_file: str, removed_file: str, location_name: str = '',
+               chunk_size: int = CLEAN_CHUNK_ROWS, report=None, lead_index=None) -> (int, int):
+    """`stream_file` with CSV outputs."""
+    return stream_file(input_file, output_file, removed_file, location_name, chunk_size, report, lead_index)
@@ -0,0 +1,96 @@
+import argparse
+import os
+import sys
+import time
+
+# Headless entry point for the Mass Lead Upload rules. Importing this module
+# has no side effects and loads nothing beyond the standard library; pandas,
+# pyarrow and openpyxl are imported only by the code paths that use them.
+
+# CSV files up to this size are cleaned row by row with the standard library;
+# small files finish before pandas would have finished importing
+ROW_ENGINE_MAX_BYTES = 16 * 1024 * 1024
+
+# Mirrors leadIO.OUTPUT_FORMATS, which is not imported so that --help stays fast
+OUTPUT_FORMATS = ('csv', 'xlsx', 'parquet', 'arrow')
+
+def output_format(args) -> str:
+    """The --format given, or the one the output file's extension asks for (CSV by default)."""
+    if args.format:
+        return args.format
+    extension = os.path.splitext(args.output_file)[1].lower()
+    if extension in ('.feather', '.ipc'):
+        return 'arrow'
+    return extension[1:] if extension[1:] in OUTPUT_FORMATS else 'csv'
+
+def choose_engine(args) -> str:
+    """Picks 'rows' (standard library) or 'pandas' for an --engine of 'auto'."""
+    if args.engine != 'auto':
+        return args.engine
+    if (args.input_file == '-' or not args.input_file.lower().endswith('.csv') or args.lead_index
+            or output_format(args) != 'csv'):
+        return 'pandas'
+    return 'rows' if os.path.getsize(args.input_file) <= ROW_ENGINE_MAX_BYTES else 'pandas'
+
+def report_progress(rows_read, rows_per_sec):
+    print(f"{rows_read:,} rows processed ({rows_per_sec:,.0f} rows/sec)", file=sys.stderr)
+
+def run(args) -> (int, int):
+    engine = choose_engine(args)
+    if engine == 'rows':
+        if not args.input_file.lower().endswith('.csv') or args.lead_index or output_format(args) != 'csv':
+            raise ValueError("The rows engine only reads and writes CSV, and does not support --lead-index")
+        from leadProfile import stage
+        from leadRows import clean_csv_rows
+        with stage('Clean rows') as cleaned:
+            retained, removed = clean_csv_rows(args.input_file, args.output_file, args.removed_file,
+                                               args.location_name)
+            cleaned['rows'] = retained + removed
+        return retained, removed
+
+    from leadCleaning import stream_file
+    lead_index = None
+    if args.lead_index:
+        from leadIndex import LeadIndex
+        lead_index = LeadIndex(args.lead_index)
+    report = report_progress if args.verbose else None
+    return stream_file(args.input_file, args.output_file, args.removed_file, args.location_name,
+                       args.chunk_size, report, lead_index, output_format(args))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Apply the Mass Lead Upload rules to a CSV, XLSX or Parquet file, writing the cleaned "
+                    "rows and the removed rows as CSV, XLSX, Parquet or Arrow IPC.")
+    parser.add_argument('input_file', help="CSV, XLSX or Parquet file to read ('-' for CSV on stdin)")
+    parser.add_argument('output_file', help="File for the cleaned rows ('-' for CSV on stdout)")
+    parser.add_argument('--removed-file', default='removed_rows.csv', help="File for the removed rows")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS,
+                        help="Format of both outputs (default: from the output file's extension, else csv)")
+    parser.add_argument('--location-name', default='', help="Location Name to set on every row")
+    parser.add_argument('--engine', choices=('auto', 'rows', 'pandas'), default='auto',
+                        help="'rows' cleans CSV row by row with no pandas import; 'pandas' cleans in "
+                             "chunks and suits large files. 'auto' (default) picks by file size.")
+    parser.add_argument('--chunk-size', type=int, default=50000, help="Rows per chunk with the pandas engine")
+    parser.add_argument('--lead-index', metavar='PATH',
+                        help="Remove leads already recorded in this index file, then record the retained ones")
+    parser.add_argument('--profile', action='store_true',
+                        help="Print wall time, rows and peak memory for each stage as JSON to stderr")
+    parser.add_argument('-v', '--verbose', action='store_true', help="Report progress after each chunk")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    try:
+        if args.profile:
+            from leadProfile import print_profile, profiling
+            with profiling() as profile:
+                retained, removed = run(args)
+            print_profile(profile)
+        else:
+            retained, removed = run(args)
+    except (OSError, ValueError) as e:
+        parser.exit(1, f"Error: {e}\n")
+    print(f"Processing complete. {retained} rows retained; {removed} rows removed "
+          f"in {time.perf_counter() - started:.2f}s.", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
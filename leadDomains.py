@@ -0,0 +1,172 @@
+import csv
+import os
+from functools import lru_cache
+
+# Offline check for misspelled email domains ('gmial.com', 'yaho.com'). Only
+# the standard library is imported here, so the row-by-row CLI path can use it.
+
+# Email domains known to be good, most common first; ties between equally
+# close suggestions go to the domain listed first
+EMAIL_DOMAINS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'email_domains.csv')
+
+# Domains this short are never treated as typos: too many real domains are
+# one letter away from a popular one (e.g. 'ge.com' and 'me.com')
+MIN_TYPO_LENGTH = 7
+
+# Domains at least this long may be two edits away from a known one
+# ('gmial.com'); shorter ones only one ('yaho.com')
+TWO_EDIT_LENGTH = 9
+
+# Generic top-level domains providers run mail on. Any two-letter top-level
+# domain is a country's, so 'yahoo.ie' and 'outlook.de' are real domains of a
+# known provider rather than misspellings of 'yahoo.de' or 'outlook.es'
+GENERIC_SUFFIXES = frozenset({'com', 'net', 'org', 'edu', 'gov', 'info', 'biz'})
+
+# Country top-level domains that are nearly always '.com' mistyped ('gmail.co',
+# 'gmail.cm', 'gmail.om'), so they are still checked
+COM_TYPO_SUFFIXES = frozenset({'co', 'cm', 'om'})
+
+# Second-level labels of country domains ('yahoo.co.jp', 'yahoo.com.br')
+SECOND_LEVEL_LABELS = frozenset({'co', 'com', 'net', 'org', 'ne', 'or', 'ac', 'gen'})
+
+def load_domains(path: str = EMAIL_DOMAINS_FILE) -> tuple:
+    """Reads the domains (lowercase, in file order) from the domain column of a CSV file."""
+    with open(path, newline='', encoding='utf-8') as f:
+        return tuple(row['domain'].strip().lower() for row in csv.DictReader(f))
+
+def edit_distance(a: str, b: str) -> int:
+    """Levenshtein distance: the fewest insertions, deletions and substitutions turning `a` into `b`."""
+    # A shared prefix or suffix (usually the '.com') never changes the distance
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < len(a) - start and end < len(b) - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a, b = a[start:len(a) - end], b[start:len(b) - end]
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        current = [i]
+        for j, cb in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+# --------------------------------------------------
+# Near-Miss Index
+# --------------------------------------------------
+
+def _deletions(word: str, count: int) -> set:
+    """Every string made by deleting up to `count` characters from `word`, including `word` itself."""
+    found, frontier = {word}, {word}
+    for _ in range(count):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        found |= frontier
+    return found
+
+class DeletionIndex:
+    """
+    Symmetric-deletion index for finding the words within a few edits of a
+    query. Every string made by deleting up to `max_distance` characters from a
+    known word points back to that word. Two words within k edits always share
+    such a string, so a lookup only generates the query's own deletions and
+    measures the distance to the few words they point to, instead of comparing
+    the query with every word.
+    """
+
+    def __init__(self, words=(), max_distance: int = 2):
+        self.max_distance = max_distance
+        self._ranks = {}
+        self._words_by_deletion = {}
+        for word in words:
+            self.add(word)
+
+    def __len__(self) -> int:
+        return len(self._ranks)
+
+    def add(self, word: str) -> None:
+        if word in self._ranks:
+            return
+        self._ranks[word] = len(self._ranks)
+        for deletion in _deletions(word, self.max_distance):
+            self._words_by_deletion.setdefault(deletion, []).append(word)
+
+    def search(self, word: str, max_distance: int) -> list:
+        """
+        Returns a list of (distance, word) for every word within `max_distance`
+        (at most the index's `max_distance`) edits, closest first, then in the
+        order they were added.
+        """
+        max_distance = min(max_distance, self.max_distance)
+        candidates = {candidate for deletion in _deletions(word, max_distance)
+                      for candidate in self._words_by_deletion.get(deletion, ())}
+        found = sorted((edit_distance(word, candidate), self._ranks[candidate], candidate) for candidate in candidates)
+        return [(distance, candidate) for distance, _, candidate in found if distance <= max_distance]
+
+def is_real_suffix(suffix: str) -> bool:
+    """
+    Returns True if `suffix`, a domain without its first label ('com',
+    'co.uk', 'com.br'), is a generic or country suffix providers use.
+    """
+    labels = suffix.split('.')
+    top = labels[-1]
+    if len(labels) == 1 and top in COM_TYPO_SUFFIXES:
+        return False
+    if top not in GENERIC_SUFFIXES and not (len(top) == 2 and top.isalpha()):
+        return False
+    return len(labels) <= 2 and all(label in SECOND_LEVEL_LABELS for label in labels[:-1])
+
+KNOWN_DOMAINS = load_domains()
+
+@lru_cache(maxsize=None)
+def known_domain_index() -> DeletionIndex:
+    """The index of KNOWN_DOMAINS, built on first use."""
+    return DeletionIndex(KNOWN_DOMAINS)
+
+# --------------------------------------------------
+# Domain Checks
+# --------------------------------------------------
+
+class DomainChecker:
+    """
+    Suggests corrections for misspelled email domains: an exact lookup in the
+    known domains first, then a bounded search of the deletion index for near
+    misses. A known provider under another real suffix ('hotmail.nl',
+    'yahoo.com.br') is never a misspelling, however close it is to a listed
+    domain; a mistyped suffix ('gmail.con') still is.
+
+    Decisions are cached by domain for the life of the checker. Make one per
+    upload: most uploads contain only a few hundred distinct domains, so nearly
+    every row is a cache hit.
+    """
+
+    def __init__(self, domains: tuple = None):
+        if domains is None:
+            self.known, self.index = frozenset(KNOWN_DOMAINS), known_domain_index()
+        else:
+            self.known, self.index = frozenset(domains), DeletionIndex(domains)
+        self.providers = frozenset(domain.partition('.')[0] for domain in self.known)
+        self.cache = {}
+
+    def suggestion(self, domain: str):
+        """Returns the known domain a misspelled `domain` most likely meant, or None."""
+        if domain in self.cache:
+            return self.cache[domain]
+        key = domain.strip().lower()
+        suggestion = None
+        provider, _, suffix = key.partition('.')
+        other_suffix = provider in self.providers and is_real_suffix(suffix)
+        if key not in self.known and not other_suffix and len(key) >= MIN_TYPO_LENGTH:
+            matches = self.index.search(key, 2 if len(key) >= TWO_EDIT_LENGTH else 1)
+            if matches:
+                suggestion = matches[0][1]
+        self.cache[domain] = suggestion
+        return suggestion
+
+    def corrected_email(self, email: str):
+        """Returns `email` with its domain replaced by the suggestion, or None if the domain looks right."""
+        local, _, domain = email.rpartition('@')
+        suggestion = self.suggestion(domain)
+        return None if suggestion is None else f"{local}@{suggestion}"
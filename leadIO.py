@@ -0,0 +1,701 @@
+import abc
+import csv
+import io
+import os
+import re
+import sys
+import zipfile
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+from pandas.api.types import union_categoricals
+from openpyxl import Workbook, load_workbook
+from openpyxl.utils import get_column_letter
+
+from leadRows import NA_VALUES, unique_names
+from leadRules import CONTACT_COLUMNS, PHONE_COLUMNS, REASON_COLUMN, cell_text, reason_text
+from leadProfile import stage
+from leadSchema import column_renames
+
+# Rows converted from a DataFrame at a time when writing XLSX
+XLSX_CHUNK_ROWS = 10000
+
+# Rows per DataFrame chunk when reading XLSX
+XLSX_READ_CHUNK_ROWS = 10000
+
+# Rows per DataFrame chunk when reading CSV or Parquet
+READ_CHUNK_ROWS = 50000
+
+# Bytes of CSV pyarrow parses per block; blocks are parsed on all cores at once
+CSV_BLOCK_BYTES = 4 * 1024 * 1024
+
+# Rows parsed at a time by iter_lean_chunks
+LEAN_READ_CHUNK_ROWS = 50000
+
+# In lean mode, text columns with at most this share of distinct values are stored as categoricals
+LEAN_CATEGORY_MAX_SHARE = 0.05
+
+# Folder name in a per-location ZIP for rows with a blank location
+NO_LOCATION_NAME = 'No Location'
+
+# Text of every removal reason code, looked up by code when the rows are written
+REASON_TEXT = np.array([reason_text(code) for code in range(256)], dtype=object)
+
+# Characters Windows and macOS do not allow in file names
+UNSAFE_FILE_NAME_REGEX = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+# The sheet of an XLSX file written by write_xlsx_rows, and its rows and cell references
+XLSX_SHEET = 'xl/worksheets/sheet1.xml'
+XLSX_ROW_REGEX = re.compile(rb'<row r="(\d+)"([^>]*?)(?:/>|>(.*?)</row>)', re.S)
+XLSX_CELL_REF_REGEX = re.compile(rb'<c r="([A-Z]+)\d+"')
+
+# --------------------------------------------------
+# XLSX Input
+# --------------------------------------------------
+
+def _header_names(header) -> list:
+    """
+    Names columns the way pd.read_excel does: blank headers become
+    'Unnamed: <position>' and repeated names get a '.1', '.2', ... suffix.
+    """
+    names, seen = [], {}
+    for i, name in enumerate(header):
+        name = f"Unnamed: {i}" if name is None else name
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+def _xlsx_chunk(rows: list, columns: list, text_columns) -> pd.DataFrame:
+    chunk = pd.DataFrame(rows, columns=columns, dtype=object)
+    for col in text_columns:
+        if col in chunk.columns:
+            chunk[col] = [cell_text(v) for v in chunk[col]]
+    other_cols = [col for col in chunk.columns if col not in text_columns]
+    chunk[other_cols] = chunk[other_cols].infer_objects()
+    return chunk
+
+def iter_xlsx_chunks(source, chunk_rows: int = XLSX_READ_CHUNK_ROWS, first_chunk_rows: int = None,
+                     text_columns=PHONE_COLUMNS):
+    """
+    Reads the first sheet of an XLSX file with openpyxl's read-only mode and
+    yields it as DataFrames of `chunk_rows` rows, so callers can show or process
+    the start of a large workbook before the rest has been parsed.
+
+    `first_chunk_rows` sets a smaller size for the first chunk (e.g. a preview).
+    Columns in `text_columns`, or under one of their aliases (see leadSchema),
+    are read as strings, so long phone numbers are never rounded through float;
+    other columns get their types inferred per chunk.
+    At least one (possibly empty) chunk is yielded.
+    Raises ValueError if the sheet has no header row.
+    """
+    wb = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            raise ValueError("The workbook's first sheet is empty")
+        columns = _header_names(header)
+        width = len(columns)
+        # Also a phone column under another name, e.g. 'Cell'
+        renames = column_renames(columns)
+        text_columns = [col for col in columns if renames.get(col, col) in text_columns]
+
+        size = first_chunk_rows or chunk_rows
+        buffer, yielded = [], False
+        for row in rows:
+            # Blank rows (often just leftover formatting) carry no lead data
+            if all(v is None for v in row):
+                continue
+            buffer.append((tuple(row) + (None,) * width)[:width])
+            if len(buffer) == size:
+                yield _xlsx_chunk(buffer, columns, text_columns)
+                buffer, yielded, size = [], True, chunk_rows
+        if buffer or not yielded:
+            yield _xlsx_chunk(buffer, columns, text_columns)
+    finally:
+        wb.close()
+
+# --------------------------------------------------
+# CSV and Parquet Input
+# --------------------------------------------------
+
+def _csv_header(source) -> list:
+    """Reads the header row of a CSV path or seekable binary file, leaving the file at the start."""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, newline='', encoding='utf-8-sig') as f:
+            return next(csv.reader(f), None)
+    text = io.TextIOWrapper(source, encoding='utf-8-sig', newline='')
+    try:
+        return next(csv.reader(text), None)
+    finally:
+        text.detach()
+        source.seek(0)
+
+def _frames(tables, start: int = 0):
+    """Converts Arrow tables to DataFrames numbered on from `start`, as pd.read_csv's chunks are."""
+    for table in tables:
+        df = table.to_pandas()
+        df.index = pd.RangeIndex(start, start + len(df))
+        start += len(df)
+        yield df
+
+def _rebatch(batches, chunk_rows: int):
+    """Regroups Arrow record batches of any size into tables of `chunk_rows` rows (the last may be shorter)."""
+    buffer, rows = [], 0
+    for batch in batches:
+        buffer.append(batch)
+        rows += batch.num_rows
+        while rows >= chunk_rows:
+            table = pa.Table.from_batches(buffer)
+            yield table.slice(0, chunk_rows)
+            rest = table.slice(chunk_rows)
+            buffer, rows = rest.to_batches(), rest.num_rows
+    if rows:
+        yield pa.Table.from_batches(buffer)
+
+def iter_csv_chunks(source, chunk_rows: int = READ_CHUNK_ROWS):
+    """
+    Reads a CSV path or seekable binary file with every column as text and
+    yields it as DataFrames of `chunk_rows` rows. Gives the same chunks as
+    pd.read_csv(source, dtype=str, chunksize=chunk_rows): pandas' NA markers
+    are missing, repeated column names get '.1', '.2', ... and blank lines
+    are skipped.
+
+    Parsing uses pyarrow's multithreaded reader, which is several times
+    faster. pyarrow rejects rows with too few fields, which pandas pads with
+    missing values, so from the first such row on the file is read by pandas.
+    At least one (possibly empty) chunk is yielded.
+    Raises ValueError if the file has no header row.
+    """
+    header = _csv_header(source)
+    if header is None:
+        raise ValueError("No columns to parse from file")
+    names = unique_names([name or f"Unnamed: {i}" for i, name in enumerate(header)])
+
+    rows_done = 0
+    try:
+        reader = pa_csv.open_csv(
+            source,
+            read_options=pa_csv.ReadOptions(column_names=names, skip_rows=1, block_size=CSV_BLOCK_BYTES),
+            parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+            convert_options=pa_csv.ConvertOptions(column_types={name: pa.string() for name in names},
+                                                  null_values=sorted(NA_VALUES), strings_can_be_null=True),
+        )
+        for chunk in _frames(_rebatch(reader, chunk_rows)):
+            yield chunk
+            rows_done += len(chunk)
+    except pa.ArrowInvalid:
+        # Rows up to here parsed the same in both readers; pandas carries on from there
+        if not isinstance(source, (str, os.PathLike)):
+            source.seek(0)
+        skip = rows_done
+        for chunk in pd.read_csv(source, dtype=str, chunksize=chunk_rows):
+            if skip >= len(chunk):
+                skip -= len(chunk)
+                continue
+            yield chunk.iloc[skip:]
+            rows_done += len(chunk) - skip
+            skip = 0
+    if not rows_done:
+        yield pd.DataFrame({name: pd.Series(dtype=str) for name in names})
+
+def read_csv_frame(source) -> pd.DataFrame:
+    """
+    Reads a whole CSV path or seekable binary file into the frame
+    pd.read_csv(source) gives, with pyarrow's multithreaded parser. Files
+    where the two parsers differ are read again by pandas' own parser: rows
+    with too few fields (which pandas pads with missing values and pyarrow
+    rejects), blank or repeated column names (which pandas renames) and
+    files with no rows.
+    """
+    try:
+        df = pd.read_csv(source, engine='pyarrow')
+        if len(df) and '' not in df.columns and not df.columns.has_duplicates:
+            return df
+    except (pa.ArrowInvalid, pd.errors.ParserError):
+        pass
+    if not isinstance(source, (str, os.PathLike)):
+        source.seek(0)
+    return pd.read_csv(source)
+
+def iter_parquet_chunks(source, chunk_rows: int = READ_CHUNK_ROWS):
+    """
+    Reads a Parquet path or file and yields it as DataFrames of `chunk_rows`
+    rows, keeping the column types stored in the file. At least one (possibly
+    empty) chunk is yielded.
+    """
+    import pyarrow.parquet as pq
+    parquet_file = pq.ParquetFile(source)
+    tables = (pa.Table.from_batches([batch]) for batch in parquet_file.iter_batches(batch_size=chunk_rows))
+    yielded = False
+    for chunk in _frames(tables):
+        yield chunk
+        yielded = True
+    if not yielded:
+        yield parquet_file.schema_arrow.empty_table().to_pandas()
+
+def iter_input_chunks(source, file_name: str = None, chunk_rows: int = READ_CHUNK_ROWS):
+    """
+    Reads a CSV, XLSX or Parquet file in DataFrame chunks, picking the reader
+    by the extension of `file_name` (or of `source` if it is a path).
+    '-' reads CSV from stdin with pandas.
+    """
+    if source == '-':
+        yield from pd.read_csv(sys.stdin, dtype=str, chunksize=chunk_rows)
+        return
+    name = (file_name or os.fspath(source)).lower()
+    if name.endswith('.xlsx'):
+        yield from iter_xlsx_chunks(source, chunk_rows)
+    elif name.endswith('.parquet'):
+        yield from iter_parquet_chunks(source, chunk_rows)
+    else:
+        yield from iter_csv_chunks(source, chunk_rows)
+
+# --------------------------------------------------
+# Memory-Lean Frames
+# --------------------------------------------------
+
+def _category_columns(df: pd.DataFrame) -> list:
+    """Text columns with few enough distinct values to store as categoricals; never contact columns."""
+    renames = column_renames(df.columns)
+    return [col for col in df.columns
+            if renames.get(col, col) not in CONTACT_COLUMNS
+            and (pd.api.types.is_object_dtype(df[col].dtype) or pd.api.types.is_string_dtype(df[col].dtype))
+            and df[col].nunique() <= LEAN_CATEGORY_MAX_SHARE * len(df)]
+
+def compact_frame(df: pd.DataFrame, categorical=None) -> pd.DataFrame:
+    """
+    Returns `df` with text columns stored compactly: columns with few distinct
+    values (Location Name, Gender, ...), or the columns in `categorical` if
+    given, become categoricals and the rest Arrow-backed strings. Contact
+    columns are never picked as categoricals, since the cleaning rules rewrite
+    them. Values are unchanged.
+    """
+    if categorical is None:
+        categorical = _category_columns(df)
+    types = {}
+    for col in df.columns:
+        if col in categorical:
+            if not isinstance(df[col].dtype, pd.CategoricalDtype):
+                types[col] = 'category'
+        elif pd.api.types.is_object_dtype(df[col].dtype) and pd.api.types.infer_dtype(df[col]) in ('string', 'empty'):
+            types[col] = pd.StringDtype('pyarrow')
+    return df.astype(types) if types else df
+
+def concat_frames(frames: list) -> pd.DataFrame:
+    """
+    Joins DataFrame chunks like pd.concat, except that categorical columns
+    with different categories in each chunk stay categorical (pd.concat would
+    turn them back into Python objects). Arrow-backed columns are joined
+    without copying.
+    """
+    if len(frames) == 1:
+        return frames[0]
+    index = frames[0].index.append([frame.index for frame in frames[1:]])
+    columns = {}
+    for col in frames[0].columns:
+        parts = [frame[col] for frame in frames]
+        if all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            columns[col] = pd.Series(union_categoricals(parts, ignore_order=True), index=index, name=col)
+        else:
+            columns[col] = pd.concat(parts)
+    return pd.DataFrame(columns, copy=False)
+
+def iter_lean_chunks(source, file_name: str, chunk_rows: int = LEAN_READ_CHUNK_ROWS):
+    """
+    Reads a CSV, XLSX or Parquet file (see `iter_input_chunks`) `chunk_rows` rows
+    at a time and yields each chunk compacted with `compact_frame`, so the whole
+    file is never held as plain Python strings. CSV columns are all read as
+    text, as `CSV-to-CSV.py --stream` does. The categorical columns are picked
+    from the first chunk, so every chunk agrees.
+
+    Before each chunk, memory Arrow freed while the previous chunk was being
+    cleaned is handed back to the operating system rather than kept pooled.
+    """
+    categorical = None
+    for chunk in iter_input_chunks(source, file_name, chunk_rows):
+        if categorical is None:
+            categorical = _category_columns(chunk)
+        yield compact_frame(chunk, categorical)
+        pa.default_memory_pool().release_unused()
+
+# --------------------------------------------------
+# XLSX Output
+# --------------------------------------------------
+
+def export_frame(dataframe: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns the frame as it is written out: removal reason codes (see
+    leadCleaning.clean_frame) become their text. Other frames are returned as they are.
+    """
+    reasons = dataframe.get(REASON_COLUMN)
+    if reasons is None or not pd.api.types.is_integer_dtype(reasons.dtype):
+        return dataframe
+    text = REASON_TEXT[reasons.to_numpy(dtype=np.uint8)]
+    return dataframe.assign(**{REASON_COLUMN: pd.Series(text, index=dataframe.index, dtype=str)})
+
+def write_xlsx_rows(output, header, rows, sheet_name: str = 'Sheet1'):
+    """
+    Writes a header and an iterable of rows to a single-sheet XLSX file using
+    openpyxl's write-only mode. Rows are streamed to disk as they are appended,
+    so memory use does not depend on the number of rows.
+    `output` may be a path or a binary file-like object.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_name)
+    ws.append(list(header))
+    for row in rows:
+        ws.append(row)
+    wb.save(output)
+
+class XlsxFrameWriter:
+    """
+    Streams DataFrame chunks into one write-only XLSX sheet, writing the header
+    from the first chunk. Use as a context manager; the file is saved on exit.
+    """
+
+    def __init__(self, output, sheet_name: str = 'Sheet1'):
+        self.output = output
+        self._wb = Workbook(write_only=True)
+        self._ws = self._wb.create_sheet(sheet_name)
+        self._header_written = False
+
+    def write(self, dataframe: pd.DataFrame) -> None:
+        if not self._header_written:
+            self._ws.append(list(dataframe.columns))
+            self._header_written = True
+        with stage('Write XLSX', len(dataframe)):
+            for row in frame_rows(dataframe):
+                self._ws.append(row)
+
+    def close(self) -> None:
+        self._wb.save(self.output)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def frame_rows(dataframe: pd.DataFrame, chunk_rows: int = XLSX_CHUNK_ROWS, progress=None, positions=None):
+    """
+    Yields the rows of a DataFrame as tuples, with missing values as None.
+    Only `chunk_rows` rows are converted to Python objects at a time.
+    `progress`, if given, is called with the number of rows yielded so far.
+    With `positions` (an array of row positions), only those rows are yielded,
+    without first copying them out of the frame.
+    """
+    rows = len(dataframe) if positions is None else len(positions)
+    for start in range(0, rows, chunk_rows):
+        if positions is None:
+            chunk = dataframe.iloc[start:start + chunk_rows]
+        else:
+            chunk = dataframe.take(positions[start:start + chunk_rows])
+        chunk = export_frame(chunk).astype(object)
+        chunk = chunk.where(chunk.notna(), None)
+        yield from chunk.itertuples(index=False, name=None)
+        if progress:
+            progress(start + len(chunk))
+
+def frame_to_xlsx(dataframe: pd.DataFrame, progress=None) -> bytes:
+    """
+    Converts a Pandas DataFrame to XLSX bytes with the write-only writer.
+    `progress` is passed on to `frame_rows`.
+    """
+    with stage('Write XLSX', len(dataframe)):
+        output = BytesIO()
+        write_xlsx_rows(output, dataframe.columns, frame_rows(dataframe, progress=progress))
+        return output.getvalue()
+
+def _xlsx_cell_regex(letter: bytes, row: bytes = rb'\d+'):
+    """Matches a whole cell of column `letter` (e.g. b'A'), in any row by default."""
+    return re.compile(b'<c r="' + letter + row + rb'"(?:[^>]*/>|[^>]*>.*?</c>)', re.S)
+
+# A data row (not the header) whose first cell is not in column A, or that has no cells
+XLSX_NO_FIRST_CELL_REGEX = re.compile(rb'(<row r="(?!1")(\d+)"[^/>]*>)(?!<c r="A\d)')
+
+def _xlsx_cell_template(column_index: int, value) -> tuple:
+    """
+    Renders the cell openpyxl writes for `value` in column `column_index` of
+    row 2, split around the row number. Returns None if no cell is written.
+    """
+    output = BytesIO()
+    write_xlsx_rows(output, [''] * (column_index + 1), [[None] * column_index + [value]])
+    letter = get_column_letter(column_index + 1).encode()
+    found = _xlsx_cell_regex(letter, b'2').search(zipfile.ZipFile(output).read(XLSX_SHEET))
+    if found is None:
+        return None
+    prefix = b'<c r="' + letter
+    return prefix, found[0][len(prefix) + 1:]
+
+def xlsx_with_column(xlsx: bytes, column_index: int, values) -> bytes:
+    """
+    Returns a copy of an XLSX file written by `write_xlsx_rows` (e.g. by
+    `frame_to_xlsx`) with the data cells of one column replaced: by one value
+    for every row, or by a list with one value per data row. Only that column
+    is rewritten and the rest of the sheet is copied as is, which is many times
+    faster than writing the whole file again. Each distinct value is rendered
+    by openpyxl once, so the cells match a freshly written file.
+    """
+    letter = get_column_letter(column_index + 1).encode()
+    existing = _xlsx_cell_regex(letter)
+    after = (len(letter), letter)
+    per_row = isinstance(values, (list, tuple, np.ndarray, pd.Series))
+    templates = {}
+
+    def template(value) -> tuple:
+        if value not in templates:
+            templates[value] = _xlsx_cell_template(column_index, value)
+        return templates[value]
+
+    def cell(value, row: bytes) -> bytes:
+        parts = template(value)
+        return b'' if parts is None else parts[0] + row + parts[1]
+
+    def replace_row(match) -> bytes:
+        row, attributes, cells = match.group(1), match.group(2), match.group(3) or b''
+        if row == b'1':
+            return match.group(0)
+        new = cell(values[int(row) - 2] if per_row else values, row)
+        found = existing.search(cells)
+        if found:
+            cells = cells[:found.start()] + new + cells[found.end():]
+        elif new:
+            # Cells are in column order
+            refs = (ref for ref in XLSX_CELL_REF_REGEX.finditer(cells) if (len(ref[1]), ref[1]) > after)
+            position = next(refs, None)
+            position = len(cells) if position is None else position.start()
+            cells = cells[:position] + new + cells[position:]
+        else:
+            return match.group(0)
+        return b'<row r="' + row + b'"' + attributes.rstrip() + b'>' + cells + b'</row>'
+
+    def replace_column(sheet: bytes) -> bytes:
+        if per_row:
+            return XLSX_ROW_REGEX.sub(replace_row, sheet)
+        # One value for every row: swap the cells in one pass over the sheet,
+        # and fill in missing ones without visiting every row in Python where possible
+        parts = template(values)
+        replacement = b'' if parts is None else parts[0] + rb'\1' + parts[1].replace(b'\\', b'\\\\')
+        sheet, replaced = _xlsx_cell_regex(letter, rb'((?!1")\d+)').subn(replacement, sheet)
+        if parts is None or replaced == sheet.count(b'<row ') - 1:
+            return sheet
+        if column_index == 0:
+            return XLSX_NO_FIRST_CELL_REGEX.sub(lambda match: match[1] + cell(values, match[2]), sheet)
+        return XLSX_ROW_REGEX.sub(replace_row, sheet)
+
+    source = zipfile.ZipFile(BytesIO(xlsx))
+    output = BytesIO()
+    with zipfile.ZipFile(output, 'w', allowZip64=True) as target:
+        for info in source.infolist():
+            data = source.read(info)
+            if info.filename == XLSX_SHEET:
+                data = replace_column(data)
+            target.writestr(info, data)
+    return output.getvalue()
+
+# --------------------------------------------------
+# Per-Location ZIP Output
+# --------------------------------------------------
+
+def group_positions(dataframe: pd.DataFrame, column: str) -> dict:
+    """
+    Groups rows by the value of `column` in one pass, without copying them.
+    Values are compared with surrounding spaces removed; blank values are
+    grouped under ''. Returns a dict:
+        {value: sorted array of row positions}
+    Raises ValueError if the column is missing.
+    """
+    if column not in dataframe.columns:
+        raise ValueError(f"Missing location column: {column}")
+    # Blank values get code -1, which sorts first; a stable sort keeps each group in row order
+    codes, values = pd.factorize(dataframe[column])
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(-1, len(values) + 1))
+    groups = {}
+    for code in range(-1, len(values)):
+        positions = order[bounds[code + 1]:bounds[code + 2]]
+        if len(positions):
+            value = '' if code < 0 else str(values[code]).strip()
+            groups.setdefault(value, []).append(positions)
+    return {value: np.sort(np.concatenate(parts)) if len(parts) > 1 else parts[0]
+            for value, parts in groups.items()}
+
+def location_folder_names(locations) -> dict:
+    """
+    Maps each location to a folder name that is safe on any operating system
+    and distinct from the others (ignoring case). Returns a dict:
+        {location: folder name}
+    """
+    names, used = {}, set()
+    for location in locations:
+        base = UNSAFE_FILE_NAME_REGEX.sub('_', location).strip(' .') or NO_LOCATION_NAME
+        name, count = base, 1
+        while name.lower() in used:
+            count += 1
+            name = f"{base} ({count})"
+        used.add(name.lower())
+        names[location] = name
+    return names
+
+def locations_to_zip(cleaned: pd.DataFrame, removed: pd.DataFrame, column: str = 'Location Name',
+                     cleaned_name: str = 'output.xlsx', removed_name: str = 'removed_rows.xlsx',
+                     progress=None) -> bytes:
+    """
+    Splits the cleaned and removed rows by location (the value of `column`) and
+    returns a ZIP archive with a folder per location holding `cleaned_name` and
+    `removed_name`. Each workbook is streamed straight into the archive from
+    the rows of its group, so no per-location copy of either frame is made.
+    `progress`, if given, is called with the number of rows written so far.
+    Raises ValueError if either frame lacks `column`.
+    """
+    groups = [group_positions(cleaned, column), group_positions(removed, column)]
+    locations = sorted(set(groups[0]) | set(groups[1]))
+    folders = location_folder_names(locations)
+    empty = np.array([], dtype=np.intp)
+    done = 0
+
+    with stage('Write location ZIP', len(cleaned) + len(removed)):
+        output = BytesIO()
+        # The workbooks are already compressed, so they are stored as they are
+        with zipfile.ZipFile(output, 'w', zipfile.ZIP_STORED) as archive:
+            for location in locations:
+                for dataframe, positions, file_name in ((cleaned, groups[0], cleaned_name),
+                                                        (removed, groups[1], removed_name)):
+                    positions = positions.get(location, empty)
+                    rows_progress = (lambda rows, done=done: progress(done + rows)) if progress else None
+                    with archive.open(f"{folders[location]}/{file_name}", 'w') as member:
+                        write_xlsx_rows(member, dataframe.columns,
+                                        frame_rows(dataframe, progress=rows_progress, positions=positions))
+                    done += len(positions)
+        return output.getvalue()
+
+# --------------------------------------------------
+# CSV, Parquet and Arrow Output
+# --------------------------------------------------
+
+# Output formats the chunk writers support
+OUTPUT_FORMATS = ('xlsx', 'csv', 'parquet', 'arrow')
+
+# File extensions of each format other than its own name
+FORMAT_EXTENSIONS = {'.feather': 'arrow', '.ipc': 'arrow'}
+
+def format_for_path(path: str, default: str = 'csv') -> str:
+    """Returns the output format a file name asks for by its extension, or `default`."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension[1:] in OUTPUT_FORMATS:
+        return extension[1:]
+    return FORMAT_EXTENSIONS.get(extension, default)
+
+class CsvFrameWriter:
+    """Appends DataFrame chunks to a CSV file ('-' for stdout), writing the header with the first one."""
+
+    def __init__(self, output: str):
+        self._file = sys.stdout if output == '-' else open(output, 'w', newline='', encoding='utf-8')
+        self._header_written = False
+
+    def write(self, dataframe: pd.DataFrame) -> None:
+        with stage('Write CSV', len(dataframe)):
+            export_frame(dataframe).to_csv(self._file, header=not self._header_written, index=False)
+        self._header_written = True
+
+    def close(self) -> None:
+        if self._file is sys.stdout:
+            self._file.flush()
+        else:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def frame_to_csv(dataframe: pd.DataFrame) -> bytes:
+    """Converts a DataFrame to CSV bytes, written as CsvFrameWriter writes it."""
+    with stage('Write CSV', len(dataframe)):
+        return export_frame(dataframe).to_csv(index=False).encode('utf-8')
+
+def _writable_schema(schema: pa.Schema) -> pa.Schema:
+    """
+    Returns `schema` with its null-typed fields made strings. A column that is
+    blank in every row of the first chunk (or a first chunk with no rows) has
+    no type of its own, and later chunks with text in it must still fit.
+    """
+    for i, field in enumerate(schema):
+        if pa.types.is_null(field.type):
+            schema = schema.set(i, field.with_type(pa.large_string()))
+        elif pa.types.is_dictionary(field.type) and pa.types.is_null(field.type.value_type):
+            schema = schema.set(i, field.with_type(pa.dictionary(field.type.index_type, pa.large_string())))
+    return schema
+
+class _ArrowFrameWriter(abc.ABC):
+    """
+    Base of the Parquet and Arrow IPC writers. Each chunk is converted to an
+    Arrow table with the first chunk's schema, so a column typed differently
+    by one chunk (e.g. integers, then floats) still fits the file.
+    """
+
+    stage_name = None
+
+    def __init__(self, output: str):
+        if output == '-':
+            raise ValueError(f"{self.stage_name} output can only be written to a file")
+        self.output = output
+        self._writer = None
+        self._schema = None
+
+    @abc.abstractmethod
+    def _open(self, schema: pa.Schema):
+        """Returns the underlying writer for `schema`, with `.write_table(table)` and `.close()`."""
+
+    def write(self, dataframe: pd.DataFrame) -> None:
+        with stage(f'Write {self.stage_name}', len(dataframe)):
+            table = pa.Table.from_pandas(export_frame(dataframe), schema=self._schema, preserve_index=False)
+            if self._writer is None:
+                self._schema = _writable_schema(table.schema)
+                table = table.cast(self._schema)
+                self._writer = self._open(self._schema)
+            self._writer.write_table(table)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class ParquetFrameWriter(_ArrowFrameWriter):
+    """Streams DataFrame chunks into one Parquet file, one row group per chunk."""
+
+    stage_name = 'Parquet'
+
+    def _open(self, schema: pa.Schema):
+        import pyarrow.parquet as pq
+        return pq.ParquetWriter(self.output, schema)
+
+class ArrowFrameWriter(_ArrowFrameWriter):
+    """Streams DataFrame chunks into one Arrow IPC (Feather v2) file."""
+
+    stage_name = 'Arrow'
+
+    def _open(self, schema: pa.Schema):
+        return pa.ipc.new_file(self.output, schema)
+
+def frame_writer(output: str, output_format: str):
+    """Returns a chunk writer (a context manager with `.write(df)`) for one of OUTPUT_FORMATS."""
+    writers = {'xlsx': XlsxFrameWriter, 'csv': CsvFrameWriter, 'parquet': ParquetFrameWriter,
+               'arrow': ArrowFrameWriter}
+    if output_format not in writers:
+        raise ValueError(f"Unknown output format: {output_format}")
+    return writers[output_format](output)
@@ -0,0 +1,174 @@
+import json
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from leadRules import PHONE_COLUMNS
+
+# Default location of the index of previously uploaded leads
+LEAD_INDEX_PATH = os.path.join(os.path.expanduser('~'), '.os_upload', 'lead_index.sqlite3')
+
+# Keys sent to SQLite per statement
+KEY_BATCH = 1000000
+
+# Hash keys are 16 characters; a different one per kind keeps an email and a
+# phone number with the same text from colliding
+EMAIL_HASH_KEY = 'lead-index-email'
+PHONE_HASH_KEY = 'lead-index-phone'
+
+# --------------------------------------------------
+# Keys
+# --------------------------------------------------
+
+def _hash_strings(strings: pa.Array, hash_key: str) -> np.ndarray:
+    """64-bit hashes of non-null strings, as signed ints so SQLite can store them."""
+    values = strings.to_numpy(zero_copy_only=False)
+    return pd.util.hash_array(values, hash_key=hash_key, categorize=False).view(np.int64)
+
+def _present(values) -> (pa.Array, np.ndarray):
+    strings = pc.cast(pa.array(values, from_pandas=True, type=pa.large_string()), pa.large_string())
+    present = pc.fill_null(pc.greater(pc.utf8_length(strings), 0), False)
+    return strings, present.to_numpy(zero_copy_only=False)
+
+def email_keys(values) -> (np.ndarray, np.ndarray):
+    """
+    Index keys for an email column: addresses are trimmed and lower-cased first.
+    Returns a tuple:
+        (keys of the non-blank values, boolean mask of which values were non-blank)
+    """
+    strings, present = _present(values)
+    normalized = pc.utf8_lower(pc.utf8_trim_whitespace(pc.filter(strings, present)))
+    return _hash_strings(normalized, EMAIL_HASH_KEY), present
+
+def phone_keys(values) -> (np.ndarray, np.ndarray):
+    """
+    Index keys for a phone column: digits only, with a leading '1' dropped from
+    numbers longer than 10 digits, the same normalization as is_valid_phone.
+    Returns a tuple:
+        (keys of the non-blank values, boolean mask of which values were non-blank)
+    """
+    strings, present = _present(values)
+    digits = pc.replace_substring_regex(pc.filter(strings, present), r'\D', '')
+    drop_one = pc.and_(pc.starts_with(digits, '1'), pc.greater(pc.utf8_length(digits), 10))
+    digits = pc.if_else(drop_one, pc.utf8_slice_codeunits(digits, 1), digits)
+    return _hash_strings(digits, PHONE_HASH_KEY), present
+
+def frame_keys(df: pd.DataFrame) -> list:
+    """
+    Index keys for every contact column present in `df`; blank cells have no key.
+    Returns a list of (keys, mask of the rows they belong to) tuples, one per column.
+    """
+    columns = [('Email', email_keys)] + [(col, phone_keys) for col in PHONE_COLUMNS]
+    return [key_fn(df[col]) for col, key_fn in columns if col in df.columns]
+
+# --------------------------------------------------
+# Index
+# --------------------------------------------------
+
+class LeadIndex:
+    """
+    On-disk set of the normalized emails and phone numbers of leads that have
+    already been uploaded, stored as 64-bit hashes in a SQLite table.
+
+    A batch of keys is passed to SQLite as one JSON array and joined against
+    the table with json_each, so a check costs one statement instead of one
+    query per row. SQLite handles locking, so several processes can share one
+    index file.
+    """
+
+    def __init__(self, path: str = LEAD_INDEX_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._con = sqlite3.connect(path, check_same_thread=False)
+        self._con.execute('CREATE TABLE IF NOT EXISTS leads (key INTEGER PRIMARY KEY) WITHOUT ROWID')
+        self._con.commit()
+        self._adds = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._con.execute('SELECT COUNT(*) FROM leads').fetchone()[0]
+
+    def version(self) -> tuple:
+        """
+        Changes whenever leads are added, by this object or by another connection
+        to the same file. Used in cache keys for results checked against the index.
+        """
+        with self._lock:
+            return self._adds, self._con.execute('PRAGMA data_version').fetchone()[0]
+
+    @staticmethod
+    def _batches(keys: np.ndarray):
+        unique = np.sort(keys)
+        unique = unique[np.concatenate(([True], unique[1:] != unique[:-1]))]
+        for start in range(0, len(unique), KEY_BATCH):
+            yield json.dumps(unique[start:start + KEY_BATCH].tolist())
+
+    def contains(self, keys: np.ndarray) -> np.ndarray:
+        """Returns a boolean mask of which keys are already in the index."""
+        if not len(keys):
+            return np.zeros(0, dtype=bool)
+        found = []
+        with self._lock:
+            for batch in self._batches(keys):
+                (matches,) = self._con.execute(
+                    'SELECT json_group_array(leads.key) FROM json_each(?) AS batch '
+                    'JOIN leads ON leads.key = batch.value', (batch,)).fetchone()
+                found.extend(json.loads(matches))
+        return np.isin(keys, np.array(found, dtype=np.int64))
+
+    def add(self, keys: np.ndarray) -> int:
+        """Adds keys to the index and returns how many were new."""
+        if not len(keys):
+            return 0
+        with self._lock:
+            before = self._con.total_changes
+            with self._con:
+                for batch in self._batches(keys):
+                    self._con.execute('INSERT OR IGNORE INTO leads SELECT value FROM json_each(?)', (batch,))
+            self._adds += 1
+            return self._con.total_changes - before
+
+    def keys(self, df: pd.DataFrame) -> np.ndarray:
+        """Returns the keys of every email and phone number in `df`, for `add`."""
+        keys = [keys for keys, _ in frame_keys(df)]
+        return np.concatenate(keys) if keys else np.zeros(0, dtype=np.int64)
+
+    def duplicate_mask(self, df: pd.DataFrame) -> np.ndarray:
+        """Returns a boolean mask of the rows with any email or phone number already in the index."""
+        columns = frame_keys(df)
+        if not columns:
+            return np.zeros(len(df), dtype=bool)
+        found = self.contains(np.concatenate([keys for keys, _ in columns]))
+
+        mask = np.zeros(len(df), dtype=bool)
+        start = 0
+        for keys, present in columns:
+            mask[present] |= found[start:start + len(keys)]
+            start += len(keys)
+        return mask
+
+    def record(self, df: pd.DataFrame) -> int:
+        """Adds the emails and phone numbers of every row of `df`; returns how many were new."""
+        return self.add(self.keys(df))
+
+    def close(self) -> None:
+        with self._lock:
+            self._con.close()
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def shared_index(path: str = LEAD_INDEX_PATH) -> LeadIndex:
+    """Returns the process-wide LeadIndex for `path`, opening it on first use."""
+    with _indexes_lock:
+        if path not in _indexes:
+            _indexes[path] = LeadIndex(path)
+        return _indexes[path]
@@ -0,0 +1,307 @@
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pandas as pd
+
+from leadCache import EXPORT_CACHE, RESULT_CACHE, frame_nbytes
+from leadCleaning import clean_in_chunks, clean_leads, with_location_name
+from leadIO import frame_rows, frame_to_csv, frame_to_xlsx, locations_to_zip, xlsx_with_column
+from leadProfile import profiling, stage
+
+# Jobs that run at the same time; pandas and Arrow release the GIL for most of the work
+JOB_WORKERS = max(os.cpu_count() or 1, 2)
+
+# Finished jobs kept around for their sessions to pick up
+JOB_HISTORY = 200
+
+# A cached export is patched for a new Location Name only if the column it
+# goes back to has at most this many distinct values; each is rendered once
+PATCH_MAX_VALUES = 1000
+
+# Processes writing whole XLSX exports, so the processed and removed files can
+# be written at the same time: XLSX writing is pure Python, and threads would
+# only take turns holding the GIL. With one core, exports are written in the
+# thread that asks for them.
+EXPORT_PROCESSES = min(os.cpu_count() or 1, 2)
+
+# --------------------------------------------------
+# Jobs
+# --------------------------------------------------
+
+class QueueFull(RuntimeError):
+    """Raised by JobRunner.submit when `max_pending` jobs are already waiting or running."""
+
+class Job:
+    """
+    Progress and outcome of one background job. The worker thread updates it
+    and the UI reads it on every rerun.
+    """
+
+    def __init__(self, job_id: str, rows_total: int = 0):
+        self.id = job_id
+        self.status = 'queued'
+        self.stage = 'Waiting for a free worker'
+        self.rows_done = 0
+        self.rows_total = rows_total
+        self.result = None
+        self.error = None
+        self.profile = None
+        self.submitted = time.time()
+        self.finished = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ('done', 'failed')
+
+    @property
+    def fraction(self) -> float:
+        """Share of the current stage completed, between 0 and 1."""
+        if not self.rows_total:
+            return 0.0
+        return min(self.rows_done / self.rows_total, 1.0)
+
+    def update(self, stage: str = None, rows_done: int = None, rows_total: int = None) -> None:
+        if stage is not None:
+            self.stage = stage
+        if rows_total is not None:
+            self.rows_total = rows_total
+        if rows_done is not None:
+            self.rows_done = rows_done
+
+class JobRunner:
+    """
+    Runs jobs on a shared thread pool so long uploads never block the
+    Streamlit script thread or other sessions. Jobs are looked up by id,
+    and only the most recent `history` finished jobs are kept.
+    With `max_pending`, at most that many jobs wait or run at once; more are
+    turned away (see `submit`) rather than queued without limit.
+    """
+
+    def __init__(self, max_workers: int = JOB_WORKERS, history: int = JOB_HISTORY, max_pending: int = None):
+        self.max_workers = max_workers
+        self.history = history
+        self.max_pending = max_pending
+        self.rejected = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='lead-job')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, rows_total: int = 0, **kwargs) -> str:
+        """
+        Queues `fn(job, *args, **kwargs)` and returns the new job's id.
+        `fn` reports progress through `job.update`; its return value becomes `job.result`.
+        Raises QueueFull if `max_pending` jobs have not finished yet.
+        """
+        job = Job(uuid.uuid4().hex, rows_total)
+        with self._lock:
+            self._check_capacity()
+            self._jobs[job.id] = job
+            finished = [job_id for job_id, j in self._jobs.items() if j.done]
+            for job_id in finished[:max(len(finished) - self.history, 0)]:
+                del self._jobs[job_id]
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job.id
+
+    def check_capacity(self) -> None:
+        """
+        Raises QueueFull (counting it as rejected) if a job submitted now would
+        be turned away, e.g. before reading an upload the job would clean.
+        """
+        with self._lock:
+            self._check_capacity()
+
+    def _check_capacity(self) -> None:
+        if self.max_pending is not None and sum(not job.done for job in self._jobs.values()) >= self.max_pending:
+            self.rejected += 1
+            raise QueueFull(f"{self.max_pending} jobs are already waiting or running")
+
+    def get(self, job_id: str):
+        """Returns the Job with this id, or None if it is unknown or expired."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def queue_depth(self) -> int:
+        """Number of submitted jobs that have not finished yet."""
+        with self._lock:
+            return sum(not job.done for job in self._jobs.values())
+
+    def stats(self) -> dict:
+        """
+        Returns a dict of job counts by status ('queued', 'running', 'done',
+        'failed'; finished jobs only while they are kept), plus 'queue_depth'
+        (jobs not finished), 'rejected' (turned away since start),
+        'max_pending' and 'workers'.
+        """
+        with self._lock:
+            counts = {status: 0 for status in ('queued', 'running', 'done', 'failed')}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            return {**counts, 'queue_depth': counts['queued'] + counts['running'], 'rejected': self.rejected,
+                    'max_pending': self.max_pending, 'workers': self.max_workers}
+
+    def forget(self, job_id: str) -> None:
+        """Drops a finished job, e.g. once its outputs have been deleted."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.done:
+                del self._jobs[job_id]
+
+    @staticmethod
+    def _run(job: Job, fn, args, kwargs) -> None:
+        job.status = 'running'
+        try:
+            job.result = fn(job, *args, **kwargs)
+            job.update(stage='Done')
+            job.status = 'done'
+        except Exception as e:
+            job.error = str(e) or repr(e)
+            job.status = 'failed'
+        finally:
+            job.finished = time.time()
+
+# Shared by every session of the app for as long as the server runs
+RUNNER = JobRunner()
+
+# --------------------------------------------------
+# Upload Processing
+# --------------------------------------------------
+
+def located_frames(cleaned: pd.DataFrame, removed: pd.DataFrame, location_name: str,
+                   lean: bool = False) -> (pd.DataFrame, pd.DataFrame):
+    """
+    Sets the Location Name on a cleaning result made without one (see
+    leadCleaning.with_location_name). Returns a tuple:
+        (cleaned DataFrame, DataFrame of removed rows)
+    """
+    return (with_location_name(cleaned, location_name, lean),
+            with_location_name(removed, location_name, lean, len(cleaned.columns)))
+
+_export_pool = None
+_export_pool_lock = threading.Lock()
+
+def export_pool():
+    """
+    Returns the process pool XLSX exports are written on, started on first
+    use, or None if EXPORT_PROCESSES is less than 2.
+    """
+    global _export_pool
+    if EXPORT_PROCESSES < 2:
+        return None
+    with _export_pool_lock:
+        if _export_pool is None:
+            # Spawned rather than forked, since the app's server runs many threads
+            _export_pool = ProcessPoolExecutor(EXPORT_PROCESSES, mp_context=multiprocessing.get_context('spawn'))
+        return _export_pool
+
+def export_output(result_key: tuple, name: str, base: pd.DataFrame, frame: pd.DataFrame, location_name: str,
+                  output_format: str = 'xlsx', lean: bool = False) -> bytes:
+    """
+    Returns one output (`name`, e.g. 'cleaned') of the result cached under
+    `result_key` as 'xlsx' or 'csv' bytes, with the Location Name set: `base`
+    is the output as cleaned without a Location Name and `frame` is it with
+    `location_name`. Nothing is written until an export is asked for, so the
+    app can pass this to a download button and write only the files that are
+    downloaded.
+
+    Exports are cached under `result_key + (output_format, name, location_name)`.
+    When only the Location Name differs from an XLSX export already cached, that
+    export's Location Name column is rewritten (see leadIO.xlsx_with_column)
+    instead of writing every row again. Otherwise a whole XLSX file is written
+    on the export pool (see `export_pool`), so exports asked for at the same
+    time are written side by side; with `lean`, it is written here instead, so
+    the rows are never copied to another process. CSV is always written here.
+    """
+    key = result_key + (output_format, name, location_name)
+    cached = EXPORT_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    if output_format == 'csv':
+        data = frame_to_csv(frame)
+        EXPORT_CACHE.put(key, data, len(data))
+        return data
+
+    # Exports with and without a Location Name only share their columns if the file had one
+    prefix = result_key + (output_format, name)
+    sources = [k for k in EXPORT_CACHE.keys() if k[:-1] == prefix
+               and ('Location Name' in base.columns or (k[-1] and location_name))]
+    source = EXPORT_CACHE.get(sources[-1]) if sources else None
+    values = location_name
+    if source is not None and not location_name:
+        values = [row[0] for row in frame_rows(frame[['Location Name']])]
+        distinct = set(values)
+        if len(distinct) == 1:
+            values = distinct.pop()
+        elif len(distinct) > PATCH_MAX_VALUES:
+            source = None
+
+    pool = None if lean or source is not None else export_pool()
+    if source is not None:
+        with stage('Rewrite Location Name', len(frame)):
+            data = xlsx_with_column(source, frame.columns.get_loc('Location Name'), values)
+    elif pool is not None:
+        with stage('Write XLSX', len(frame)):
+            data = pool.submit(frame_to_xlsx, frame).result()
+    else:
+        data = frame_to_xlsx(frame)
+    EXPORT_CACHE.put(key, data, len(data))
+    return data
+
+def clean_and_export(job: Job, df, location_name: str, result_key: tuple, lead_index=None,
+                     lean: bool = False, split_column: str = None) -> (pd.DataFrame, pd.DataFrame, dict, dict):
+    """
+    Background job for the "Process File" button: cleans the upload (removing
+    leads already in `lead_index`, if given) without a Location Name and caches
+    the result under `result_key`, which must not depend on the Location Name.
+    So a new Location Name costs one column, not another pass of the rules.
+    The files themselves are written when they are downloaded (see
+    `export_output`). Each stage is timed in `job.profile`.
+    With `lean`, `df` is an iterable of compact chunks (see leadIO.iter_lean_chunks)
+    cleaned as they are read; otherwise it is the whole upload as a DataFrame.
+    With `split_column`, the job also builds the ZIP of both outputs split by
+    that column (see `location_zip`).
+    Returns a tuple, without the Location Name set:
+        (cleaned DataFrame, DataFrame of removed rows, {reason label: rows},
+         {misspelled email domain: suggested domain})
+    """
+    with profiling() as job.profile:
+        result = RESULT_CACHE.get(result_key)
+        if result is None:
+            progress = lambda rows: job.update(rows_done=rows)
+            if lean:
+                job.update('Validating rows', 0)
+                cleaned_df, removed_rows, diagnostics = clean_leads(df, '', lead_index, lean=True,
+                                                                    progress=progress)
+            else:
+                job.update('Validating rows', 0, len(df))
+                diagnostics = {}
+                cleaned_df, removed_rows = clean_in_chunks(df, '', progress=progress, lead_index=lead_index,
+                                                           diagnostics=diagnostics)
+            result = cleaned_df, removed_rows, diagnostics.get('reasons', {}), diagnostics.get('email_typos', {})
+            RESULT_CACHE.put(result_key, result, frame_nbytes(cleaned_df, removed_rows))
+        cleaned_df, removed_rows = result[:2]
+
+        if split_column:
+            location_zip(job, result_key, cleaned_df, removed_rows, location_name, split_column, lean)
+    return result
+
+def location_zip(job: Job, result_key: tuple, cleaned_df: pd.DataFrame, removed_rows: pd.DataFrame,
+                 location_name: str, split_column: str, lean: bool = False) -> bytes:
+    """
+    Background job: returns a single ZIP with both outputs of the result cached
+    under `result_key` for each value of `split_column` (see
+    leadIO.locations_to_zip), with `location_name` set on the rows as cleaned
+    without one. Built once per result, column and Location Name, and cached
+    under `result_key + ('zip', split_column, location_name)`.
+    """
+    located = located_frames(cleaned_df, removed_rows, location_name, lean)
+    job.update('Writing location files', 0, len(cleaned_df) + len(removed_rows))
+    return EXPORT_CACHE.get_or_compute(
+        result_key + ('zip', split_column, location_name),
+        lambda: locations_to_zip(*located, split_column, progress=lambda rows: job.update(rows_done=rows)),
+    )
@@ -0,0 +1,174 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Seconds between memory samples while a profile is recording
+PROFILE_SAMPLE_SECONDS = 0.01
+
+MB = 1024 * 1024
+
+# --------------------------------------------------
+# Memory
+# --------------------------------------------------
+
+def current_rss() -> int:
+    """
+    Resident memory of this process in bytes, or None where it cannot be read
+    (install psutil to get it on Windows and macOS).
+    """
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+# --------------------------------------------------
+# Profiles
+# --------------------------------------------------
+
+_active = ContextVar('lead_profile', default=None)
+
+class Profile:
+    """
+    Wall time, rows processed and peak memory for each named stage of a run.
+    Stages with the same name (e.g. one per chunk) are added together.
+
+    While the profile is active, a background thread samples the resident
+    memory of the process, and every open stage keeps the highest value seen.
+    Memory is per process, so stages running at the same time in other threads
+    share their peaks.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.started = None
+        self.seconds = 0.0
+        self.peak_rss = None
+        self._open = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def _sample(self) -> None:
+        rss = current_rss()
+        if rss is None:
+            return
+        with self._lock:
+            self.peak_rss = max(self.peak_rss or 0, rss)
+            for record in self._open:
+                record['peak'] = max(record['peak'], rss)
+
+    def _sample_until_stopped(self) -> None:
+        while not self._stop.wait(PROFILE_SAMPLE_SECONDS):
+            self._sample()
+
+    def start(self) -> None:
+        self.started = time.perf_counter()
+        self._stop.clear()
+        self._sample()
+        if current_rss() is not None:
+            self._sampler = threading.Thread(target=self._sample_until_stopped, name='lead-profile', daemon=True)
+            self._sampler.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+            self._sampler = None
+        self._sample()
+        self.seconds += time.perf_counter() - self.started
+
+    @contextmanager
+    def stage(self, name: str, rows: int = 0):
+        """
+        Times the body of the `with` block as one call of stage `name`.
+        Yields a dict whose 'rows' entry can be set when the count is only known at the end.
+        """
+        rss = current_rss()
+        record = {'start': rss or 0, 'peak': rss or 0, 'rows': rows}
+        with self._lock:
+            self._open.append(record)
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            seconds = time.perf_counter() - started
+            self._sample()
+            with self._lock:
+                self._open.remove(record)
+                totals = self.stages.setdefault(
+                    name, {'calls': 0, 'seconds': 0.0, 'rows': 0, 'peak_rss': 0, 'peak_growth': 0})
+                totals['calls'] += 1
+                totals['seconds'] += seconds
+                totals['rows'] += record['rows']
+                if rss is not None:
+                    totals['peak_rss'] = max(totals['peak_rss'], record['peak'])
+                    totals['peak_growth'] = max(totals['peak_growth'], record['peak'] - record['start'])
+
+    def report(self) -> dict:
+        """Returns the profile as plain data, ready for json.dumps."""
+        stages = []
+        with self._lock:
+            for name, totals in self.stages.items():
+                stages.append({
+                    'stage': name,
+                    'calls': totals['calls'],
+                    'seconds': round(totals['seconds'], 4),
+                    'rows': totals['rows'],
+                    'rows_per_sec': round(totals['rows'] / totals['seconds']) if totals['seconds'] else None,
+                    'peak_rss_mb': round(totals['peak_rss'] / MB, 1) if self.peak_rss else None,
+                    'peak_growth_mb': round(totals['peak_growth'] / MB, 1) if self.peak_rss else None,
+                })
+        return {
+            'seconds': round(self.seconds, 4),
+            'peak_rss_mb': round(self.peak_rss / MB, 1) if self.peak_rss else None,
+            'stages': stages,
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.report(), indent=2)
+
+@contextmanager
+def profiling(profile: Profile = None):
+    """
+    Makes `profile` (a new Profile by default) the one `stage` records into,
+    for the current thread or task, and yields it. Background jobs call this
+    inside the job so their stages are recorded too.
+    """
+    profile = profile or Profile()
+    token = _active.set(profile)
+    profile.start()
+    try:
+        yield profile
+    finally:
+        profile.stop()
+        _active.reset(token)
+
+@contextmanager
+def stage(name: str, rows: int = 0):
+    """
+    Records the body of the `with` block as stage `name` of the active profile,
+    yielding the dict described in `Profile.stage`. Does nothing when no
+    profile is active, so it can stay in the hot path.
+    """
+    profile = _active.get()
+    if profile is None:
+        yield {'rows': rows}
+        return
+    with profile.stage(name, rows) as record:
+        yield record
+
+def print_profile(profile: Profile, file=None) -> None:
+    """Prints a profile as JSON, to stderr by default so it never mixes with data on stdout."""
+    print(profile.to_json(), file=file or sys.stderr)
@@ -0,0 +1,139 @@
+import csv
+import os
+import sys
+
+from leadDomains import DomainChecker
+from leadRules import (EMAIL_TYPOS, REASON_COLUMN, REASON_EMAIL_TYPO, REASON_INVALID_EMAIL, REASON_NO_CONTACT,
+                       is_valid_email, is_valid_phone, normalize_phone, phone_reason, reason_text)
+from leadSchema import compile_plan
+
+# Cells pandas.read_csv reads as missing by default. The row path treats them
+# the same way, so both paths keep, blank and drop exactly the same cells.
+NA_VALUES = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+])
+
+# --------------------------------------------------
+# Row Cleaning
+# --------------------------------------------------
+
+def unique_names(header) -> list:
+    """Renames repeated column names 'X', 'X.1', 'X.2', ... like pandas.read_csv."""
+    names, counts = [], {}
+    for name in header:
+        base, count = name, counts.get(name, 0)
+        while name in counts:
+            count += 1
+            name = f"{base}.{count}"
+        counts[base] = count
+        counts[name] = 0
+        names.append(name)
+    return names
+
+def _open_text(path: str, mode: str):
+    if path == '-':
+        return sys.stdin if mode == 'r' else sys.stdout
+    # utf-8-sig drops a byte order mark, as pandas does
+    return open(path, mode, newline='', encoding='utf-8-sig' if mode == 'r' else 'utf-8')
+
+def iter_clean_rows(rows, header: list, location_name: str = ''):
+    """
+    Applies the Mass Lead Upload rules (see leadCleaning.clean_frame) to CSV rows
+    one at a time, by the positions in the header's leadSchema.ColumnPlan.
+    Yields tuples:
+        (output header, None) once, then (row, reason code) for every row that
+        has a first and last name; rows missing either are dropped. A reason
+        code of 0 means the row is retained (see leadRules.REASON_LABELS).
+    Raises ValueError if a required column is missing.
+    """
+    plan = compile_plan(unique_names(header), location_name)
+    yield list(plan.header), None
+
+    width, padded = plan.width, len(plan.header)
+    location = plan.location if location_name else None
+    first, last, email, phones, contacts = plan.first, plan.last, plan.email, plan.phones, plan.contacts
+    domain_checker = DomainChecker()
+
+    for line, row in enumerate(rows, start=2):
+        # Blank lines are skipped, as pandas does
+        if not row:
+            continue
+        if len(row) > width:
+            raise ValueError(f"Expected {width} fields in line {line}, saw {len(row)}")
+        row = [None if cell in NA_VALUES else cell for cell in row] + [None] * (padded - len(row))
+        if location is not None:
+            row[location] = location_name
+        if row[first] is None or row[last] is None:
+            continue
+
+        code = 0
+        for i in phones:
+            if row[i] is not None:
+                phone = row[i].strip()
+                if is_valid_phone(phone):
+                    row[i] = normalize_phone(phone)
+                else:
+                    row[i] = None
+                    code |= phone_reason(phone)
+        if email is not None and not is_valid_email(row[email]):
+            if row[email] is not None:
+                code |= REASON_INVALID_EMAIL
+            row[email] = None
+        elif email is not None and EMAIL_TYPOS in ('correct', 'remove'):
+            corrected = domain_checker.corrected_email(row[email])
+            if corrected is not None and EMAIL_TYPOS == 'correct':
+                row[email] = corrected
+            elif corrected is not None:
+                code |= REASON_EMAIL_TYPO
+                row[email] = None
+
+        if not any(row[i] is not None for i in contacts):
+            code |= REASON_NO_CONTACT
+        elif code:
+            # Invalid values were blanked, but the row is retained
+            code = 0
+        yield row, code
+
+def clean_csv_rows(input_file: str, output_file: str, removed_file: str, location_name: str = '') -> (int, int):
+    """
+    Row-by-row equivalent of leadCleaning.stream_csv for CSV input, using only
+    the standard library. Small files finish before pandas could even be
+    imported. '-' reads from stdin or writes to stdout.
+    Returns a tuple:
+        (rows retained, rows removed)
+    """
+    if output_file == '-' and removed_file == '-':
+        raise ValueError("Only one of the outputs can be written to stdout")
+
+    retained = removed = 0
+    files = [_open_text(input_file, 'r'), _open_text(output_file, 'w'), _open_text(removed_file, 'w')]
+    try:
+        reader = csv.reader(files[0])
+        header = next(reader, None)
+        if header is None:
+            raise ValueError("No columns to parse from file")
+        # Same line endings as DataFrame.to_csv
+        cleaned_out = csv.writer(files[1], lineterminator=os.linesep)
+        removed_out = csv.writer(files[2], lineterminator=os.linesep)
+
+        rows = iter_clean_rows(reader, header, location_name)
+        header, _ = next(rows)
+        cleaned_out.writerow(header)
+        removed_out.writerow(header + [REASON_COLUMN])
+        for row, code in rows:
+            if not code:
+                cleaned_out.writerow(row)
+                retained += 1
+            else:
+                removed_out.writerow(row + [reason_text(code)])
+                removed += 1
+    finally:
+        for f in files:
+            if f in (sys.stdin, sys.stdout):
+                if f is sys.stdout:
+                    f.flush()
+            else:
+                f.close()
+
+    return retained, removed
@@ -0,0 +1,218 @@
+import csv
+import json
+import os
+import re
+
+# The Mass Lead Upload rules and scalar checks. Only the standard library is
+# imported here, so the row-by-row CLI path starts without pandas or NumPy.
+
+# --------------------------------------------------
+# Patterns and Rule Settings
+# --------------------------------------------------
+
+EMAIL_REGEX = re.compile(r'^[a-zA-Z0-9._%+\-]+@[a-zA-Z0-9.\-]+\.[a-zA-Z]{2,}$')
+PHONE_REGEX = re.compile(r'^\+?[\d\s\-().]{10,15}$')
+NON_DIGIT_REGEX = re.compile(r'\D')
+
+# Settings that can be changed without editing the code; OS_UPLOAD_RULES
+# points at another settings file
+RULES_FILE = os.environ.get('OS_UPLOAD_RULES',
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lead_rules.json'))
+
+# Used for any setting the settings file leaves out
+DEFAULT_RULES = {
+    'forbidden_prefixes': ['800', '888', '555', '111'], 'phone_format': 'e164', 'email_typos': 'flag',
+    'column_aliases': {
+        'Location Name': ['Location', 'Club', 'Club Name'],
+        'First Name': ['First', 'FirstName', 'Given Name', 'fname'],
+        'Last Name': ['Last', 'LastName', 'Surname', 'Family Name', 'lname'],
+        'Email': ['E-mail', 'Email Address', 'E-mail Address'],
+        'Home Phone': ['Phone', 'Home', 'Phone Number', 'Telephone'],
+        'Mobile Phone': ['Cell', 'Cell Phone', 'Cellphone', 'Mobile', 'Mobile Number'],
+        'Work Phone': ['Work', 'Office Phone', 'Business Phone'],
+        'Postal Code': ['Zip', 'Zip Code', 'Postcode'],
+    },
+}
+
+# How valid phone numbers are written out: '+15128675309', '5128675309', or as entered
+PHONE_FORMATS = ('e164', 'digits', 'original')
+
+# What happens to an email whose domain looks misspelled (see leadDomains):
+# kept and listed for review, blanked like an invalid email, rewritten with the
+# suggested domain, or kept without checking
+EMAIL_TYPO_ACTIONS = ('flag', 'remove', 'correct', 'ignore')
+
+# NANP area codes in service (US, Canada and the Caribbean), taken from the
+# libphonenumber metadata; regenerate it when new area codes open
+AREA_CODES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'nanp_area_codes.csv')
+
+def load_rules(path: str = RULES_FILE) -> dict:
+    """
+    Reads the rule settings (a JSON object) from `path`, filling in
+    DEFAULT_RULES for missing settings or a missing file.
+    Raises ValueError for an unknown phone format or email typo action, or
+    malformed column aliases.
+    """
+    rules = dict(DEFAULT_RULES)
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            rules.update(json.load(f))
+    if rules['phone_format'] not in PHONE_FORMATS:
+        raise ValueError(f"Unknown phone format in {path}: {rules['phone_format']}")
+    if rules['email_typos'] not in EMAIL_TYPO_ACTIONS:
+        raise ValueError(f"Unknown email_typos setting in {path}: {rules['email_typos']}")
+    aliases = rules['column_aliases']
+    if not isinstance(aliases, dict) or not all(isinstance(names, list) for names in aliases.values()):
+        raise ValueError(f"column_aliases in {path} must map each column name to a list of other names")
+    return rules
+
+def load_area_codes(path: str = AREA_CODES_FILE) -> frozenset:
+    """Reads the three-digit area codes (as strings) from the area_code column of a CSV file."""
+    with open(path, newline='', encoding='utf-8') as f:
+        return frozenset(row['area_code'] for row in csv.DictReader(f))
+
+_rules = load_rules()
+
+# Numbers starting with these prefixes are treated as invalid
+FORBIDDEN_PREFIXES = tuple(_rules['forbidden_prefixes'])
+
+# One of PHONE_FORMATS
+PHONE_FORMAT = _rules['phone_format']
+
+# One of EMAIL_TYPO_ACTIONS
+EMAIL_TYPOS = _rules['email_typos']
+
+# Other names client files use for the standard columns, e.g. 'Cell' for
+# 'Mobile Phone' (see leadSchema)
+COLUMN_ALIASES = {name: tuple(aliases) for name, aliases in _rules['column_aliases'].items()}
+
+# Ten-digit numbers must start with one of these
+NANP_AREA_CODES = load_area_codes()
+
+REQUIRED_COLUMNS = ['First Name', 'Last Name']
+PHONE_COLUMNS = ['Home Phone', 'Mobile Phone', 'Work Phone']
+CONTACT_COLUMNS = ['Email'] + PHONE_COLUMNS
+
+# --------------------------------------------------
+# Removal Reasons
+# --------------------------------------------------
+
+# Column of the removed rows saying why each one was removed. While cleaning it
+# holds a small integer with one bit per rule that applied; it is written out
+# as text (see reason_text).
+REASON_COLUMN = 'Removal Reason'
+
+REASON_NO_CONTACT = 1
+REASON_ALREADY_UPLOADED = 2
+REASON_MISSING_NAME = 4
+REASON_INVALID_EMAIL = 8
+REASON_INVALID_PHONE = 16
+REASON_FORBIDDEN_PREFIX = 32
+REASON_UNKNOWN_AREA_CODE = 64
+REASON_EMAIL_TYPO = 128
+
+# Label of each reason bit, in the order they are listed in the text
+REASON_LABELS = (
+    (REASON_NO_CONTACT, 'No valid email or phone'),
+    (REASON_ALREADY_UPLOADED, 'Already uploaded'),
+    (REASON_MISSING_NAME, 'Missing first or last name'),
+    (REASON_INVALID_EMAIL, 'Invalid email'),
+    (REASON_INVALID_PHONE, 'Invalid phone number'),
+    (REASON_FORBIDDEN_PREFIX, 'Forbidden phone prefix'),
+    (REASON_UNKNOWN_AREA_CODE, 'Area code not in service'),
+    (REASON_EMAIL_TYPO, 'Misspelled email domain'),
+)
+
+def reason_text(code: int) -> str:
+    """Lists the labels of the bits set in a reason code, e.g. 'No valid email or phone; Invalid email'."""
+    return '; '.join(label for bit, label in REASON_LABELS if code & bit)
+
+def phone_reason(phone: str) -> int:
+    """Returns the reason bit for a phone number `is_valid_phone` rejects."""
+    if not isinstance(phone, str) or not PHONE_REGEX.match(phone):
+        return REASON_INVALID_PHONE
+    if phone_digits(phone).startswith(FORBIDDEN_PREFIXES):
+        return REASON_FORBIDDEN_PREFIX
+    return REASON_UNKNOWN_AREA_CODE
+
+# --------------------------------------------------
+# Scalar Checks
+# --------------------------------------------------
+
+def cell_text(value):
+    """
+    Converts a cell value to text, writing whole-number floats without '.0':
+    a number column with a blank cell is read as floats, and 5128675309.0 is
+    the phone number 5128675309.
+    """
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def is_valid_email(email: str) -> bool:
+    """
+    Checks if a given string is a valid email format.
+    Returns False if email is None or not a string.
+    """
+    if not email or isinstance(email, float):
+        return False
+    return bool(EMAIL_REGEX.match(email))
+
+def _ascii_digits(phone: str) -> str:
+    # Python's \d also matches other scripts' digits, e.g. full-width ones
+    digits = NON_DIGIT_REGEX.sub('', phone)
+    return digits if digits.isascii() else ''.join(str(int(d)) for d in digits)
+
+def phone_digits(phone: str) -> str:
+    """
+    Returns the digits of a phone number, with a leading '1' removed from
+    numbers longer than 10 digits. For NANP numbers this is the 10-digit
+    national number.
+    """
+    digits = NON_DIGIT_REGEX.sub('', phone)
+    if not digits.isascii():
+        digits = _ascii_digits(digits)
+    if digits.startswith('1') and len(digits) > 10:
+        digits = digits[1:]
+    return digits
+
+def is_valid_phone(phone: str) -> bool:
+    """
+    Checks if a given string is a valid phone format and filters out numbers
+    starting with forbidden prefixes (FORBIDDEN_PREFIXES) and 10-digit numbers
+    whose area code is not in service (NANP_AREA_CODES).
+    """
+    if not phone or isinstance(phone, float):
+        return False
+
+    # Basic format check: allows +, digits, spaces, dashes, parentheses, dots
+    if not PHONE_REGEX.match(phone):
+        return False
+
+    digits = phone_digits(phone)
+
+    # Filter out numbers with forbidden prefixes
+    if digits.startswith(FORBIDDEN_PREFIXES):
+        return False
+
+    # NANP numbers need an area code in service
+    if len(digits) == 10 and digits[:3] not in NANP_AREA_CODES:
+        return False
+
+    return True
+
+def normalize_phone(phone: str, phone_format: str = PHONE_FORMAT) -> str:
+    """
+    Writes a valid phone number in one of PHONE_FORMATS. NANP numbers become
+    '+15128675309' ('e164') or '5128675309' ('digits'); numbers of other
+    lengths keep all their digits, with a leading '+' in 'e164' if they had one.
+    """
+    if phone_format == 'original':
+        return phone
+    digits = phone_digits(phone)
+    if len(digits) == 10:
+        return '+1' + digits if phone_format == 'e164' else digits
+    digits = _ascii_digits(phone)
+    return '+' + digits if phone_format == 'e164' and phone.lstrip().startswith('+') else digits
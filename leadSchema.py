@@ -0,0 +1,94 @@
+import re
+from functools import lru_cache
+
+from leadRules import COLUMN_ALIASES, CONTACT_COLUMNS, PHONE_COLUMNS, REQUIRED_COLUMNS
+
+# Resolves the header of an uploaded file to the standard Mass Lead Upload
+# column names once per file, so the cleaning code never searches the header
+# again. Only the standard library is imported here, so the row-by-row CLI
+# path can use it.
+
+# Spaces, punctuation and underscores, ignored when matching column names
+HEADER_NOISE_REGEX = re.compile(r'[\W_]+')
+
+def header_key(name) -> str:
+    """Returns `name` in lowercase without spaces or punctuation, so 'E-mail', 'email' and 'E MAIL' match."""
+    return HEADER_NOISE_REGEX.sub('', str(name)).casefold()
+
+def _standard_names() -> dict:
+    names = {}
+    for name in ['Location Name', *REQUIRED_COLUMNS, *CONTACT_COLUMNS, *COLUMN_ALIASES]:
+        names.setdefault(header_key(name), name)
+    for name, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            names.setdefault(header_key(alias), name)
+    return names
+
+# Standard column name for each header_key of a standard name or alias
+STANDARD_NAMES = _standard_names()
+STANDARD_COLUMNS = frozenset(STANDARD_NAMES.values())
+
+class ColumnPlan:
+    """
+    Where the columns the rules read sit in one file's header, resolved once
+    (see `compile_plan`) so each row is cleaned by position alone.
+        header - output header, with aliases renamed to the standard names
+        renames - {column in the file: standard name} for the renamed columns
+        width - columns in the file's header
+        first, last - positions of First Name and Last Name
+        email, location - positions of Email and Location Name, or None
+        phones, contacts - positions of the PHONE_COLUMNS / CONTACT_COLUMNS present, in that order
+    """
+
+    def __init__(self, header: tuple, renames: dict, location_name: bool):
+        self.renames = renames
+        self.width = len(header)
+        header = [renames.get(name, name) for name in header]
+        if location_name and 'Location Name' not in header:
+            header.append('Location Name')
+        self.header = tuple(header)
+
+        positions = {}
+        for i, name in enumerate(self.header):
+            positions.setdefault(name, i)
+        for col in REQUIRED_COLUMNS:
+            if col not in positions:
+                raise ValueError(f"Missing required column: {col}")
+        self.first, self.last = positions['First Name'], positions['Last Name']
+        self.email = positions.get('Email')
+        self.location = positions.get('Location Name')
+        self.phones = tuple(positions[col] for col in PHONE_COLUMNS if col in positions)
+        self.contacts = tuple(positions[col] for col in CONTACT_COLUMNS if col in positions)
+
+def column_renames(header) -> dict:
+    """
+    Matches a header's columns to the standard names, ignoring case, spaces and
+    punctuation, and through COLUMN_ALIASES ('Cell' is 'Mobile Phone').
+    A column already named exactly as a standard column wins, then the first
+    match in the file; later matches keep their own name.
+    Returns a dict:
+        {column in the file: standard name} for the columns to rename
+    """
+    taken = {name for name in header if name in STANDARD_COLUMNS}
+    renames = {}
+    for name in header:
+        if name in taken:
+            continue
+        standard = STANDARD_NAMES.get(header_key(name))
+        if standard is not None and standard not in taken:
+            renames[name] = standard
+            taken.add(standard)
+    return renames
+
+@lru_cache(maxsize=256)
+def _compile(header: tuple, location_name: bool) -> ColumnPlan:
+    return ColumnPlan(header, column_renames(header), location_name)
+
+def compile_plan(header, location_name: str = '') -> ColumnPlan:
+    """
+    Returns the ColumnPlan of a header (a list of column names, without
+    repeats). With a `location_name`, a Location Name column is added if the
+    file has none. Plans are cached, so every chunk of a file shares one.
+    Raises ValueError if a required column is missing.
+    """
+    return _compile(tuple(header), bool(location_name))
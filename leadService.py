@@ -0,0 +1,406 @@
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+from io import BytesIO
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs, quote
+from wsgiref.simple_server import WSGIServer, make_server
+from wsgiref.util import setup_testing_defaults
+
+from leadCleaning import stream_file
+from leadJobs import JobRunner, QueueFull
+
+# Small self-hosted HTTP service around the Mass Lead Upload rules, for sync
+# jobs that post lead files instead of driving the Streamlit page. It is a
+# plain WSGI application: `main` serves it with the standard library, and
+# ServiceClient calls it in-process, so it runs and tests with no outside services.
+#
+#   POST   /jobs?file_name=leads.csv&location_name=My+Club   upload (body = file) -> 202 {"job_id": ...}
+#   GET    /jobs/<id>                                        status and row counts
+#   GET    /jobs/<id>/cleaned?format=xlsx|csv|parquet         cleaned rows
+#   GET    /jobs/<id>/removed?format=xlsx|csv|parquet         removed rows
+#   DELETE /jobs/<id>                                        delete a finished job's files
+#   GET    /metrics                                          queue depth and job counts
+#   GET    /health
+
+# Jobs cleaned at the same time
+SERVICE_WORKERS = 2
+
+# Jobs that may wait for a worker; further uploads get 429 until one finishes
+SERVICE_MAX_QUEUED = 8
+
+# Bytes read from an upload, or sent of a download, at a time
+STREAM_BLOCK_BYTES = 1024 * 1024
+
+# Seconds a client is asked to wait before retrying a rejected upload
+RETRY_AFTER_SECONDS = 5
+
+# Upload types accepted, by file extension
+UPLOAD_EXTENSIONS = ('.csv', '.xlsx', '.parquet')
+
+# Formats the outputs can be downloaded in, with their content types
+DOWNLOAD_TYPES = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv; charset=utf-8',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+# Outputs of every job
+OUTPUTS = ('cleaned', 'removed')
+
+HTTP_STATUS = {200: 'OK', 202: 'Accepted', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+               409: 'Conflict', 411: 'Length Required', 415: 'Unsupported Media Type',
+               429: 'Too Many Requests', 500: 'Internal Server Error'}
+
+class ServiceError(Exception):
+    """An error reported to the client with an HTTP status and a JSON message."""
+
+    def __init__(self, status: int, message: str, headers: list = None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or []
+
+# --------------------------------------------------
+# Jobs
+# --------------------------------------------------
+
+def run_upload(job, folder: str, upload_path: str, location_name: str, lead_index=None) -> dict:
+    """
+    Service job: cleans an uploaded file a chunk at a time (see
+    leadCleaning.stream_file), writing both outputs into `folder` as Parquet.
+    Other formats are converted from these when first downloaded.
+    Returns a dict:
+        {'rows_retained': ..., 'rows_removed': ...}
+    """
+    job.update('Cleaning rows', 0)
+    retained, removed = stream_file(upload_path, os.path.join(folder, 'cleaned.parquet'),
+                                    os.path.join(folder, 'removed.parquet'), location_name,
+                                    report=lambda rows, rate: job.update(rows_done=rows),
+                                    lead_index=lead_index, output_format='parquet')
+    os.remove(upload_path)
+    return {'rows_retained': retained, 'rows_removed': removed}
+
+def convert_parquet(source: str, output: str, output_format: str) -> None:
+    """Rewrites a Parquet file as one of leadIO.OUTPUT_FORMATS, a row group at a time."""
+    import pyarrow.parquet as pq
+    from leadIO import frame_writer
+    partial = output + '.partial'
+    with frame_writer(partial, output_format) as writer:
+        parquet = pq.ParquetFile(source)
+        for group in range(parquet.num_row_groups):
+            writer.write(parquet.read_row_group(group).to_pandas())
+    os.replace(partial, output)
+
+class LeadService:
+    """
+    What the HTTP routes do, without HTTP: saves uploads, runs them on a
+    bounded JobRunner, and hands out the outputs in the format asked for.
+    Each job gets a folder under `work_dir` holding its upload and outputs.
+
+    At most `workers` jobs run at once and `max_queued` more wait; further
+    uploads raise QueueFull before their body is read, so a busy service
+    pushes back on clients instead of buffering their files.
+    """
+
+    def __init__(self, work_dir: str = None, workers: int = SERVICE_WORKERS, max_queued: int = SERVICE_MAX_QUEUED,
+                 lead_index=None):
+        self.work_dir = work_dir or tempfile.mkdtemp(prefix='lead-service-')
+        os.makedirs(self.work_dir, exist_ok=True)
+        self.runner = JobRunner(workers, max_pending=workers + max_queued)
+        self.lead_index = lead_index
+        self.uploads = 0
+        self.upload_bytes = 0
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, stream, length: int, file_name: str, location_name: str = '') -> str:
+        """
+        Reads an upload of `length` bytes from `stream` in blocks into a new job
+        folder and queues it. Returns the job id.
+        Raises ValueError for an unsupported file type or a short upload, and
+        QueueFull if the service is busy.
+        """
+        extension = os.path.splitext(file_name)[1].lower()
+        if extension not in UPLOAD_EXTENSIONS:
+            raise ValueError(f"Unsupported file type {extension or file_name!r}; "
+                             f"expected one of {', '.join(UPLOAD_EXTENSIONS)}")
+        self.runner.check_capacity()
+        self._prune()
+
+        folder = tempfile.mkdtemp(dir=self.work_dir)
+        upload_path = os.path.join(folder, 'upload' + extension)
+        try:
+            with open(upload_path, 'wb') as f:
+                remaining = length
+                while remaining:
+                    block = stream.read(min(STREAM_BLOCK_BYTES, remaining))
+                    if not block:
+                        raise ValueError(f"Upload ended after {length - remaining} of {length} bytes")
+                    f.write(block)
+                    remaining -= len(block)
+            job_id = self.runner.submit(run_upload, folder, upload_path, location_name, self.lead_index)
+        except BaseException:
+            shutil.rmtree(folder, ignore_errors=True)
+            raise
+        with self._lock:
+            self._jobs[job_id] = {'folder': folder, 'file_name': file_name, 'lock': threading.Lock()}
+            self.uploads += 1
+            self.upload_bytes += length
+        return job_id
+
+    def status(self, job_id: str) -> dict:
+        """Returns a job's status as a dict, or None if the job is unknown."""
+        job = self.runner.get(job_id)
+        if job is None or job_id not in self._jobs:
+            return None
+        status = {'job_id': job.id, 'status': job.status, 'stage': job.stage, 'rows_done': job.rows_done,
+                  'submitted': job.submitted, 'finished': job.finished, 'error': job.error}
+        if job.status == 'done':
+            status.update(job.result)
+            status['downloads'] = {name: f"/jobs/{job.id}/{name}" for name in OUTPUTS}
+        return status
+
+    def output(self, job_id: str, name: str, output_format: str) -> (str, str):
+        """
+        Returns the path of a finished job's output ('cleaned' or 'removed') in
+        one of DOWNLOAD_TYPES, converting it on first request, and the file name
+        to download it as. Raises ServiceError if the job or output is not available.
+        """
+        if name not in OUTPUTS:
+            raise ServiceError(404, f"Unknown output: {name}")
+        if output_format not in DOWNLOAD_TYPES:
+            raise ServiceError(400, f"Unknown format {output_format!r}; expected one of {', '.join(DOWNLOAD_TYPES)}")
+        job, entry = self.runner.get(job_id), self._jobs.get(job_id)
+        if job is None or entry is None:
+            raise ServiceError(404, f"Unknown job: {job_id}")
+        if job.status != 'done':
+            raise ServiceError(409, f"Job {job_id} is {job.status}")
+
+        parquet = os.path.join(entry['folder'], name + '.parquet')
+        if not os.path.exists(parquet):
+            raise ServiceError(404, f"Job {job_id} read no rows")
+        path = os.path.join(entry['folder'], f"{name}.{output_format}")
+        with entry['lock']:
+            if not os.path.exists(path):
+                convert_parquet(parquet, path, output_format)
+        download_name = f"{os.path.splitext(entry['file_name'])[0]}_{name}.{output_format}"
+        return path, download_name
+
+    def delete(self, job_id: str) -> bool:
+        """Deletes a finished job and its files. Returns False if the job is unknown or still running."""
+        job = self.runner.get(job_id)
+        if job is not None and not job.done:
+            return False
+        with self._lock:
+            entry = self._jobs.pop(job_id, None)
+        if entry is None:
+            return False
+        shutil.rmtree(entry['folder'], ignore_errors=True)
+        self.runner.forget(job_id)
+        return True
+
+    def _prune(self) -> None:
+        # Folders of jobs the runner no longer keeps
+        with self._lock:
+            expired = [job_id for job_id in self._jobs if self.runner.get(job_id) is None]
+            folders = [self._jobs.pop(job_id)['folder'] for job_id in expired]
+        for folder in folders:
+            shutil.rmtree(folder, ignore_errors=True)
+
+    def metrics(self) -> dict:
+        """Returns the runner's job counts and queue depth (see JobRunner.stats), plus upload totals."""
+        with self._lock:
+            uploads = {'uploads': self.uploads, 'upload_bytes': self.upload_bytes}
+        return {**self.runner.stats(), **uploads}
+
+# --------------------------------------------------
+# HTTP
+# --------------------------------------------------
+
+JOB_PATH_REGEX = re.compile(r'^/jobs/([0-9a-f]{32})(?:/([a-z]+))?/?$')
+
+def _json(status: int, data: dict, headers: list = None) -> tuple:
+    body = json.dumps(data).encode('utf-8')
+    return status, [('Content-Type', 'application/json'), ('Content-Length', str(len(body)))] + (headers or []), [body]
+
+def _file_blocks(path: str):
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(STREAM_BLOCK_BYTES)
+            if not block:
+                return
+            yield block
+
+def _route(service: LeadService, environ) -> tuple:
+    method = environ['REQUEST_METHOD']
+    path = environ.get('PATH_INFO', '') or '/'
+    query = {key: values[-1] for key, values in parse_qs(environ.get('QUERY_STRING', '')).items()}
+
+    if path == '/health':
+        return _json(200, {'status': 'ok'})
+    if path == '/metrics':
+        return _json(200, service.metrics())
+
+    if path.rstrip('/') == '/jobs':
+        if method != 'POST':
+            raise ServiceError(405, "Use POST to upload a file")
+        if not query.get('file_name'):
+            raise ServiceError(400, "Missing file_name query parameter, e.g. ?file_name=leads.csv")
+        if not environ.get('CONTENT_LENGTH'):
+            raise ServiceError(411, "Send the file as the request body with a Content-Length")
+        if not environ['CONTENT_LENGTH'].isdigit() or int(environ['CONTENT_LENGTH']) == 0:
+            raise ServiceError(400, "The request body must be a non-empty file")
+        try:
+            job_id = service.submit(environ['wsgi.input'], int(environ['CONTENT_LENGTH']), query['file_name'],
+                                    query.get('location_name', ''))
+        except QueueFull as e:
+            raise ServiceError(429, str(e), [('Retry-After', str(RETRY_AFTER_SECONDS))])
+        except ValueError as e:
+            status = 415 if str(e).startswith('Unsupported') else 400
+            raise ServiceError(status, str(e))
+        return _json(202, {'job_id': job_id, 'status_url': f"/jobs/{job_id}"},
+                     [('Location', f"/jobs/{job_id}")])
+
+    match = JOB_PATH_REGEX.match(path)
+    if match is None:
+        raise ServiceError(404, f"Not found: {path}")
+    job_id, output = match.groups()
+    if output is None and method == 'DELETE':
+        if not service.delete(job_id):
+            raise ServiceError(409 if service.status(job_id) else 404, f"Job {job_id} is running or unknown")
+        return _json(200, {'job_id': job_id, 'deleted': True})
+    if method != 'GET':
+        raise ServiceError(405, f"{method} is not supported here")
+    if output is None:
+        status = service.status(job_id)
+        if status is None:
+            raise ServiceError(404, f"Unknown job: {job_id}")
+        return _json(200, status)
+
+    output_format = query.get('format', 'xlsx')
+    file_path, download_name = service.output(job_id, output, output_format)
+    headers = [('Content-Type', DOWNLOAD_TYPES[output_format]),
+               ('Content-Length', str(os.path.getsize(file_path))),
+               ('Content-Disposition', f"attachment; filename*=UTF-8''{quote(download_name)}")]
+    wrapper = environ.get('wsgi.file_wrapper')
+    body = wrapper(open(file_path, 'rb'), STREAM_BLOCK_BYTES) if wrapper else _file_blocks(file_path)
+    return 200, headers, body
+
+def make_app(service: LeadService):
+    """Returns the WSGI application serving `service`."""
+    def app(environ, start_response):
+        try:
+            status, headers, body = _route(service, environ)
+        except ServiceError as e:
+            status, headers, body = _json(e.status, {'error': str(e)}, e.headers)
+        except Exception as e:
+            status, headers, body = _json(500, {'error': str(e) or repr(e)})
+        start_response(f"{status} {HTTP_STATUS.get(status, '')}".strip(), headers)
+        return body
+    return app
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    """wsgiref's server with a thread per request, so status checks are answered during uploads."""
+    daemon_threads = True
+
+# --------------------------------------------------
+# In-Process Client
+# --------------------------------------------------
+
+class ServiceResponse:
+    def __init__(self, status: int, headers: dict, body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body)
+
+class ServiceClient:
+    """
+    Calls a WSGI application (e.g. `make_app(service)`) directly in the same
+    process, without a socket, for tests and scripts. Request bodies may be
+    bytes or a binary file, which is streamed to the application.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def request(self, method: str, path: str, body=b'', headers: dict = None) -> ServiceResponse:
+        path, _, query = path.partition('?')
+        if isinstance(body, (bytes, bytearray)):
+            length, body = len(body), BytesIO(body)
+        else:
+            length = os.fstat(body.fileno()).st_size - body.tell()
+        environ = {'REQUEST_METHOD': method, 'PATH_INFO': path, 'QUERY_STRING': query,
+                   'CONTENT_LENGTH': str(length) if length or method == 'POST' else '', 'wsgi.input': body}
+        for name, value in (headers or {}).items():
+            environ['HTTP_' + name.upper().replace('-', '_')] = value
+        setup_testing_defaults(environ)
+
+        response = {}
+        def start_response(status, response_headers, exc_info=None):
+            response['status'] = int(status.split()[0])
+            response['headers'] = dict(response_headers)
+        result = self.app(environ, start_response)
+        try:
+            data = b''.join(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return ServiceResponse(response['status'], response['headers'], data)
+
+    def get(self, path: str) -> ServiceResponse:
+        return self.request('GET', path)
+
+    def post(self, path: str, body=b'') -> ServiceResponse:
+        return self.request('POST', path, body)
+
+    def delete(self, path: str) -> ServiceResponse:
+        return self.request('DELETE', path)
+
+    def upload(self, path: str, location_name: str = '') -> ServiceResponse:
+        """Posts the file at `path` as a new job."""
+        query = f"file_name={quote(os.path.basename(path))}&location_name={quote(location_name)}"
+        with open(path, 'rb') as f:
+            return self.post(f"/jobs?{query}", f)
+
+# --------------------------------------------------
+# Command Line
+# --------------------------------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Serve the Mass Lead Upload rules over HTTP: POST a CSV, XLSX or Parquet file to /jobs, "
+                    "poll /jobs/<id>, then download /jobs/<id>/cleaned and /jobs/<id>/removed.")
+    parser.add_argument('--host', default='127.0.0.1', help="Address to listen on (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8765, help="Port to listen on (default: 8765)")
+    parser.add_argument('--workers', type=int, default=SERVICE_WORKERS, help="Jobs cleaned at the same time")
+    parser.add_argument('--max-queued', type=int, default=SERVICE_MAX_QUEUED,
+                        help="Jobs that may wait for a worker before uploads get 429 Too Many Requests")
+    parser.add_argument('--work-dir', help="Folder for uploads and outputs (default: a new temporary folder)")
+    parser.add_argument('--lead-index', metavar='PATH',
+                        help="Remove leads already recorded in this index file, then record the retained ones")
+    args = parser.parse_args(argv)
+
+    lead_index = None
+    if args.lead_index:
+        from leadIndex import LeadIndex
+        lead_index = LeadIndex(args.lead_index)
+    service = LeadService(args.work_dir, args.workers, args.max_queued, lead_index)
+    server = make_server(args.host, args.port, make_app(service), server_class=ThreadingWSGIServer)
+    print(f"Serving on http://{args.host}:{server.server_port} (files in {service.work_dir})", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from leadRules import FORBIDDEN_PREFIXES
+
+# Columns of the Mass Lead Upload template, in order (A through K)
+TEMPLATE_COLUMNS = ['Location Name', 'First Name', 'Last Name', 'Email', 'Gender', 'Birthday', 'Address',
+                    'Postal Code', 'Home Phone', 'Mobile Phone', 'Work Phone']
+
+FIRST_NAMES = ['James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda', 'David',
+               'Elizabeth', 'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah',
+               'Carlos', 'Maria', 'Wei', 'Mei', 'Ahmed', 'Fatima', 'Jose', 'Ana', 'Kevin', 'Ashley']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez',
+              'Martinez', 'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore',
+              'Jackson', 'Martin', 'Lee', 'Perez', 'Thompson', 'White', 'Harris', "O'Brien", 'Nguyen', 'Chen']
+EMAIL_DOMAINS = ['gmail.com', 'yahoo.com', 'hotmail.com', 'outlook.com', 'icloud.com', 'aol.com',
+                 'comcast.net', 'att.net', 'club-mail.org', 'example.co.uk']
+STREETS = ['Main St', 'Oak Ave', 'Park Blvd', 'Cedar Ln', 'Elm St', 'Lake Dr', 'Hill Rd', 'Maple Ct']
+AREA_CODES = ['512', '737', '210', '214', '312', '415', '646', '702', '713', '917', '303', '206']
+# Text before the area code, between the number's three parts, and after it
+PHONE_FORMATS = [('(', ') ', '-'), ('', '-', '-'), ('', '.', '.'), ('+1 ', ' ', ' '), ('1-', '-', '-'), ('', '', '')]
+
+# Values that fail validation, in the shapes client exports actually contain
+INVALID_EMAILS = ['n/a', 'none', 'bad', 'john.smith@', '@gmail.com', 'jane@gmail', 'bob smith@gmail.com',
+                  'mary@@yahoo.com', 'no email', 'x@y.c']
+INVALID_PHONES = ['n/a', 'none', '123', '555-1234', 'call me', '512-867-530', '+44 20 7946 0958 123',
+                  'ext 1234', '(512) 867-5309 x12', '0']
+
+# --------------------------------------------------
+# Generator
+# --------------------------------------------------
+
+def _pick(rng, options, rows: int) -> np.ndarray:
+    return np.asarray(options, dtype=object)[rng.integers(0, len(options), rows)]
+
+def _join(*parts) -> np.ndarray:
+    """Concatenates string arrays (or single strings) element-wise, without a Python loop."""
+    return pc.binary_join_element_wise(*parts, '').to_numpy(zero_copy_only=False)
+
+def _digits(values: np.ndarray, width: int = 0) -> pa.Array:
+    text = pc.cast(pa.array(values), pa.string())
+    return pc.utf8_lpad(text, width, '0') if width else text
+
+def _phones(rng, rows: int, forbidden_rate: float) -> np.ndarray:
+    area = _pick(rng, AREA_CODES, rows)
+    forbidden = rng.random(rows) < forbidden_rate
+    area[forbidden] = _pick(rng, FORBIDDEN_PREFIXES, int(forbidden.sum()))
+    exchange = _digits(rng.integers(200, 1000, rows))
+    line = _digits(rng.integers(0, 10000, rows), 4)
+    formats = rng.integers(0, len(PHONE_FORMATS), rows)
+    before, first_sep, second_sep = (np.asarray([fmt[i] for fmt in PHONE_FORMATS], dtype=object)[formats]
+                                     for i in range(3))
+    return _join(before, area, first_sep, exchange, second_sep, line)
+
+def _blank_or_invalid(rng, values: np.ndarray, blank_rate: float, invalid_rate: float, invalid_values) -> np.ndarray:
+    draw = rng.random(len(values))
+    values = values.copy()
+    invalid = draw < invalid_rate
+    values[invalid] = _pick(rng, invalid_values, int(invalid.sum()))
+    values[(draw >= invalid_rate) & (draw < invalid_rate + blank_rate)] = None
+    return values
+
+def generate_leads(rows: int, seed: int = 0, invalid_rate: float = 0.1, blank_rate: float = 0.15,
+                   forbidden_rate: float = 0.03, duplicate_rate: float = 0.05,
+                   missing_name_rate: float = 0.02) -> pd.DataFrame:
+    """
+    Generates `rows` rows of Mass Lead Upload template data. The same arguments
+    always give the same rows.
+
+    Each email and phone cell is independently blank (`blank_rate`) or invalid
+    (`invalid_rate`); valid phone numbers use a forbidden prefix at
+    `forbidden_rate`. `duplicate_rate` of the rows repeat an earlier lead's
+    email and phone numbers, and `missing_name_rate` of the rows lack a first or
+    last name. Location Name is left blank, as in client exports.
+    """
+    rng = np.random.default_rng(seed)
+    first = _pick(rng, FIRST_NAMES, rows)
+    last = _pick(rng, LAST_NAMES, rows)
+    emails = _join(pc.utf8_lower(first), '.', pc.replace_substring(pc.utf8_lower(last), "'", ''),
+                   _digits(rng.integers(1, 100000, rows)), '@', _pick(rng, EMAIL_DOMAINS, rows))
+    birthdays = pd.date_range('1950-01-01', '2010-12-31').strftime('%m/%d/%Y').to_numpy(dtype=object)
+
+    df = pd.DataFrame({
+        'Location Name': None,
+        'First Name': first,
+        'Last Name': last,
+        'Email': _blank_or_invalid(rng, emails, blank_rate, invalid_rate, INVALID_EMAILS),
+        'Gender': _pick(rng, ['M', 'F', None], rows),
+        'Birthday': _pick(rng, birthdays, rows),
+        'Address': _join(_digits(rng.integers(1, 9999, rows)), ' ', _pick(rng, STREETS, rows)),
+        'Postal Code': rng.integers(10000, 99999, rows).astype(str),
+        'Home Phone': _blank_or_invalid(rng, _phones(rng, rows, forbidden_rate), blank_rate * 3, invalid_rate,
+                                        INVALID_PHONES),
+        'Mobile Phone': _blank_or_invalid(rng, _phones(rng, rows, forbidden_rate), blank_rate, invalid_rate,
+                                          INVALID_PHONES),
+        'Work Phone': _blank_or_invalid(rng, _phones(rng, rows, forbidden_rate), blank_rate * 4, invalid_rate,
+                                        INVALID_PHONES),
+    }, columns=TEMPLATE_COLUMNS)
+
+    # Repeat earlier leads' contact details
+    duplicates = np.flatnonzero(rng.random(rows) < duplicate_rate)
+    duplicates = duplicates[duplicates > 0]
+    sources = (rng.random(len(duplicates)) * duplicates).astype(np.int64)
+    contact = ['Email', 'Home Phone', 'Mobile Phone', 'Work Phone']
+    df.loc[duplicates, contact] = df.loc[sources, contact].to_numpy()
+
+    # Drop the first name, the last name or both
+    missing = np.flatnonzero(rng.random(rows) < missing_name_rate)
+    which = rng.integers(0, 3, len(missing))
+    df.loc[missing[which != 1], 'First Name'] = None
+    df.loc[missing[which != 0], 'Last Name'] = None
+    return df
+
+# --------------------------------------------------
+# Command Line
+# --------------------------------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write seeded synthetic Mass Lead Upload data as CSV.")
+    parser.add_argument('output_file', help="CSV to write")
+    parser.add_argument('--rows', type=int, default=100000, help="Rows to generate (default: 100000)")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed (default: 0)")
+    parser.add_argument('--invalid-rate', type=float, default=0.1, help="Share of contact cells that are invalid")
+    parser.add_argument('--blank-rate', type=float, default=0.15, help="Share of contact cells that are blank")
+    parser.add_argument('--forbidden-rate', type=float, default=0.03,
+                        help="Share of phone numbers with a forbidden prefix")
+    parser.add_argument('--duplicate-rate', type=float, default=0.05,
+                        help="Share of rows repeating an earlier lead's contact details")
+    args = parser.parse_args(argv)
+
+    df = generate_leads(args.rows, args.seed, args.invalid_rate, args.blank_rate, args.forbidden_rate,
+                        args.duplicate_rate)
+    df.to_csv(args.output_file, index=False)
+    print(f"Wrote {len(df):,} rows to {args.output_file}")
+
+if __name__ == '__main__':
+    main()
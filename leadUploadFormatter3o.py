@@ -1,131 +1,60 @@
-import subprocess
-import sys
-
-def install(package):
-    """Installs a given package via pip."""
-    subprocess.check_call([sys.executable, "-m", "pip", "install", package])
-
-# Check and install required packages (ideally use a requirements.txt in production)
-try:
-    import streamlit as st
-except ImportError:
-    install('streamlit')
-    import streamlit as st
-
-try:
-    import pandas as pd
-except ImportError:
-    install('pandas')
-    import pandas as pd
-
-try:
-    from openpyxl import Workbook
-except ImportError:
-    install('openpyxl')
-    from openpyxl import Workbook
-
-import re
+import os
+import time
+from functools import partial
 from io import BytesIO
 
-# --------------------------------------------------
-# Utility Functions
-# --------------------------------------------------
+import pandas as pd
+import streamlit as st
 
-@st.cache_data
-def to_xlsx(dataframe: pd.DataFrame) -> bytes:
-    """
-    Converts a Pandas DataFrame to XLSX bytes using an in-memory buffer.
-    Uses caching to avoid recomputation if the data hasn’t changed.
-    """
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        dataframe.to_excel(writer, index=False)
-    return output.getvalue()
+from leadCache import EXPORT_CACHE, UPLOAD_CACHE, content_hash, frame_nbytes
+from leadCleaning import rule_settings
+from leadIndex import shared_index
+from leadIO import iter_lean_chunks, iter_xlsx_chunks, read_csv_frame
+from leadJobs import RUNNER, clean_and_export, export_output, located_frames, location_zip
+from leadProfile import profiling, stage
+from leadRules import EMAIL_TYPOS, REASON_ALREADY_UPLOADED, REASON_LABELS
+from leadSchema import column_renames
 
-def is_valid_email(email: str) -> bool:
-    """
-    Checks if a given string is a valid email format.
-    Returns False if email is None or not a string.
-    """
-    if not email or isinstance(email, float):
-        return False
-    regex = r'^[a-zA-Z0-9._%+\-]+@[a-zA-Z0-9.\-]+\.[a-zA-Z]{2,}$'
-    return bool(re.match(regex, email))
+# Rows shown in the preview of an uploaded file
+PREVIEW_ROWS = 5
 
-def is_valid_phone(phone: str) -> bool:
-    """
-    Checks if a given string is a valid phone format and filters out numbers
-    starting with forbidden prefixes (800, 888, 555, or 111).
-    """
-    if not phone or isinstance(phone, float):
-        return False
-
-    # Basic format check: allows +, digits, spaces, dashes, parentheses, dots
-    regex = r'^\+?[\d\s\-().]{10,15}$'
-    if not re.match(regex, phone):
-        return False
+# Seconds between progress bar refreshes while a job runs
+POLL_SECONDS = 0.5
 
-    # Remove non-digit characters
-    digits = re.sub(r'\D', '', phone)
+# Choice of the split selectbox that keeps the output in two files
+NO_SPLIT = "(one file for all locations)"
 
-    # Optionally remove leading '1' if the number is longer than 10 digits
-    if digits.startswith('1') and len(digits) > 10:
-        digits = digits[1:]
+# Formats the processed and removed rows files can be downloaded in, with their content types
+EXPORT_TYPES = {
+    'xlsx': "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    'csv': "text/csv",
+}
 
-    # Filter out numbers with forbidden prefixes
-    forbidden_prefixes = ('800', '888', '555', '111')
-    if any(digits.startswith(prefix) for prefix in forbidden_prefixes):
-        return False
-
-    return True
+# --------------------------------------------------
+# Utility Functions
+# --------------------------------------------------
 
-def clean_data(df: pd.DataFrame, location_name: str) -> (pd.DataFrame, pd.DataFrame):
-    """
-    Processes the DataFrame by:
-      - Adding the Location Name (if provided)
-      - Removing rows with missing 'First Name' or 'Last Name'
-      - Converting phone columns to strings for uniform validation
-      - Validating emails and phone numbers (invalid ones become None)
-      - Removing rows that have no valid contact information
-    Returns a tuple:
-        (cleaned DataFrame, DataFrame of removed rows)
-    """
-    # Set Location Name if provided
-    if location_name:
-        df['Location Name'] = location_name
-
-    # Verify required columns exist
-    for col in ['First Name', 'Last Name']:
-        if col not in df.columns:
-            st.error(f"Missing required column: {col}")
-            return None, None
-
-    # Remove rows missing First or Last Name
-    df = df[df['First Name'].notnull() & df['Last Name'].notnull()]
-
-    # Process phone columns: ensure they are strings
-    phone_cols = ['Home Phone', 'Mobile Phone', 'Work Phone']
-    for col in phone_cols:
-        if col in df.columns:
-            df[col] = df[col].apply(lambda x: str(x).strip() if pd.notnull(x) else None)
-
-    # Validate email and phone columns
-    if 'Email' in df.columns:
-        df['Email'] = df['Email'].apply(lambda x: x if is_valid_email(x) else None)
-    for col in phone_cols:
-        if col in df.columns:
-            df[col] = df[col].apply(lambda x: x if is_valid_phone(x) else None)
-
-    # Identify rows with at least one valid contact info (Email or any Phone)
-    contact_cols = ['Email'] + phone_cols
-    existing_contact_cols = [col for col in contact_cols if col in df.columns]
-    valid_mask = df[existing_contact_cols].notnull().any(axis=1)
-    removed_mask = ~valid_mask
-
-    removed_rows = df[removed_mask].copy()
-    cleaned_df = df[valid_mask].copy()
-
-    return cleaned_df, removed_rows
+def show_profile(title: str, report: dict) -> None:
+    """Shows a profile report (see leadProfile.Profile.report) as a caption and a table."""
+    peak = f"; peak memory {report['peak_rss_mb']:,} MB" if report['peak_rss_mb'] else ""
+    st.caption(f"{title}: {report['seconds']:.2f}s{peak}")
+    if report['stages']:
+        st.dataframe(pd.DataFrame(report['stages']).set_index('stage'))
+
+def show_reasons(reasons: dict) -> None:
+    """Shows how many rows each removal reason applied to, skipping reasons that never did."""
+    counts = {label: rows for label, rows in reasons.items() if rows}
+    if counts:
+        st.caption("Rows removed or dropped, by reason (a row can have several):")
+        st.dataframe(pd.DataFrame({'Rows': counts}))
+
+def show_email_typos(email_typos: dict) -> None:
+    """Shows the email domains that looked misspelled and the domain each was taken for."""
+    if email_typos:
+        action = {'flag': "kept; check them before uploading", 'remove': "removed", 'correct': "corrected",
+                  'ignore': "kept"}[EMAIL_TYPOS]
+        st.caption(f"Emails with these misspelled domains were {action}:")
+        st.dataframe(pd.DataFrame({'Suggested domain': email_typos}).rename_axis('Domain'))
 
 # --------------------------------------------------
 # Streamlit UI
@@ -138,10 +67,16 @@ st.markdown(
     
     **What this does:**
     - Adds the specified Location Name to every row.
-    - Ensures 'First Name' and 'Last Name' are present.
+    - Ensures 'First Name' and 'Last Name' are present, recognizing other common column names
+      (e.g. 'Cell' for Mobile Phone, 'E-mail' for Email) and renaming them to the standard ones.
     - Validates Email and Phone fields (Home, Mobile, Work) and clears invalid entries.
-    - Removes rows with no valid contact information.
+    - Flags emails whose domain looks misspelled (e.g. gmial.com) and clears or corrects them.
+    - Removes rows with no valid contact information, noting every reason in a 'Removal Reason' column.
+    - Optionally removes leads that were already uploaded (matched by email or phone number).
+    - Optionally splits the output by location, with one processed file and one removed rows file
+      per location in a single ZIP download.
     - Accepts CSV or Excel files (XLSX).
+    - Downloads the processed and removed rows files as XLSX or CSV; each is written when you download it.
     
     **Important:**
     - Only spreadsheets matching the [Mass Lead Upload template](https://docs.google.com/spreadsheets/d/1TdDRkGD3GAybdcoGOje7oNIxfIOIIMME/edit#gid=320862359) are supported.
@@ -149,64 +84,209 @@ st.markdown(
     """
 )
 
-uploaded_file = st.file_uploader("Select Unformatted CSV or Excel File", type=['csv', 'xlsx'])
+uploaded_file = st.file_uploader("Select Unformatted CSV, Excel or Parquet File", type=['csv', 'xlsx', 'parquet'])
+lean = st.checkbox(
+    "Memory-lean mode (for very large files)",
+    help="Reads and cleans the file a chunk at a time with compact column types, using about half the memory. "
+         "Every CSV column is read as text.",
+)
 
 if uploaded_file:
+    # Parsed uploads are cached by content, so reruns never read the file again
+    digest = content_hash(uploaded_file.getbuffer())
+    df = None if lean else UPLOAD_CACHE.get(digest)
     try:
-        if uploaded_file.name.lower().endswith('.csv'):
-            df = pd.read_csv(uploaded_file)
-        else:
-            df = pd.read_excel(uploaded_file)
+        with profiling() as read_profile:
+            if lean:
+                # Only the preview is read here; the job reads and cleans the rest a chunk at a time
+                with stage('Read preview') as read:
+                    chunks = iter_lean_chunks(BytesIO(uploaded_file.getvalue()), uploaded_file.name, PREVIEW_ROWS)
+                    preview = next(chunks)
+                    chunks.close()
+                    read['rows'] = len(preview)
+            elif df is not None:
+                preview = df.head(PREVIEW_ROWS)
+            elif uploaded_file.name.lower().endswith('.csv'):
+                with stage('Read CSV') as read:
+                    df = read_csv_frame(uploaded_file)
+                    read['rows'] = len(df)
+                preview = df.head()
+            elif uploaded_file.name.lower().endswith('.parquet'):
+                with stage('Read Parquet') as read:
+                    df = pd.read_parquet(uploaded_file)
+                    read['rows'] = len(df)
+                preview = df.head()
+            else:
+                # Show the first rows while the rest of the workbook is still being read
+                chunks = iter_xlsx_chunks(uploaded_file, first_chunk_rows=PREVIEW_ROWS)
+                with stage('Read XLSX preview') as read:
+                    preview = next(chunks)
+                    read['rows'] = len(preview)
+            st.subheader("Preview of Uploaded Data")
+            st.dataframe(preview)
+            if df is None and not lean:
+                with st.spinner("Reading the rest of the workbook..."), stage('Read XLSX') as read:
+                    df = pd.concat([preview, *chunks], ignore_index=True)
+                    read['rows'] = len(df) - len(preview)
+        if read_profile.stages:
+            st.session_state.read_profile = (digest, read_profile.report())
+        if not lean:
+            UPLOAD_CACHE.put(digest, df, frame_nbytes(df))
     except Exception as e:
         st.error(f"Error reading file: {e}")
-        df = None
-
-    if df is not None:
-        st.subheader("Preview of Uploaded Data")
-        st.dataframe(df.head())
-
-        # Inputs for location name and output filenames
-        location_name = st.text_input("Enter Location Name:")
+        df = preview = None
+
+    if preview is not None:
+        # Inputs for location name and output filenames. Splitting by the file's own
+        # Location Name column keeps each row's location instead of setting one.
+        # Cleaning gives aliased columns (e.g. 'Club') their standard names.
+        renames = column_renames(preview.columns)
+        chosen_split = st.session_state.get("split_column")
+        split_by_location = renames.get(chosen_split, chosen_split) == 'Location Name'
+        location_name = st.text_input("Enter Location Name:", disabled=split_by_location)
+        if split_by_location:
+            location_name = ''
         output_file_name = st.text_input("Enter Output File Name:", "output.xlsx")
-        removed_file_name = "removed_rows.xlsx"
-
-        # Check if we already processed the file
+        export_format = st.radio(
+            "Download format:", list(EXPORT_TYPES), format_func=str.upper, horizontal=True,
+            disabled=chosen_split not in (None, NO_SPLIT),
+            help="The admin app imports XLSX. CSV is much quicker to write. Files split by location are XLSX.",
+        )
+        output_file_name = f"{os.path.splitext(output_file_name)[0]}.{export_format}"
+        removed_file_name = f"removed_rows.{export_format}"
+        skip_uploaded = st.checkbox("Remove leads that were already uploaded", value=True)
+        split_column = st.selectbox(
+            "Split output by location column:", [NO_SPLIT, *preview.columns], key="split_column",
+            help="Writes a processed file and a removed rows file for each value of this column, "
+                 "all in one ZIP.",
+        )
+        split_column = None if split_column == NO_SPLIT else renames.get(split_column, split_column)
+
+        # Check if we already processed this file
         if "cleaned_df" not in st.session_state or "removed_rows" not in st.session_state:
             processed = False
         else:
-            processed = True
+            processed = st.session_state.get("result_key", (None,))[0] == digest
 
         if st.button("Process File"):
-            cleaned_df, removed_rows = clean_data(df, location_name)
-            if cleaned_df is None:
+            # Validation depends only on the file contents, the rules and, when
+            # duplicates are removed, the leads recorded so far. The Location Name
+            # and the file names are applied to the cached result afterwards.
+            lead_index = shared_index() if skip_uploaded else None
+            index_version = lead_index.version() if lead_index is not None else None
+            result_key = (digest, rule_settings(), index_version, lean)
+            if lean:
+                data = uploaded_file.getvalue()
+                source = iter_lean_chunks(BytesIO(data), uploaded_file.name)
+                # Line count as an estimate; XLSX progress shows rows only
+                rows_total = max(data.count(b'\n') - 1, 0) if uploaded_file.name.lower().endswith('.csv') else 0
+            else:
+                source, rows_total = df, len(df)
+            st.session_state.job_id = RUNNER.submit(
+                clean_and_export, source, location_name, result_key, lead_index, lean, split_column,
+                rows_total=rows_total,
+            )
+            st.session_state.job_key = result_key
+            st.session_state.job_split = split_column
+
+        # Follow a running job, or pick up the result of a finished one
+        job = RUNNER.get(st.session_state.get("job_id"))
+        if job is not None and not job.done:
+            total = f" of {job.rows_total:,}" if job.rows_total else ""
+            st.progress(job.fraction, text=f"{job.stage}: {job.rows_done:,}{total} rows")
+            time.sleep(POLL_SECONDS)
+            st.rerun()
+        elif job is not None:
+            del st.session_state.job_id
+            if job.status == 'failed':
+                st.error(job.error)
                 st.error("Processing halted due to errors in the uploaded file.")
             else:
+                cleaned_df, removed_rows, reasons, email_typos = job.result
                 st.session_state.cleaned_df = cleaned_df
                 st.session_state.removed_rows = removed_rows
-                processed = True
+                st.session_state.reasons = reasons
+                st.session_state.email_typos = email_typos
+                st.session_state.result_key = st.session_state.job_key
+                st.session_state.result_split = st.session_state.job_split
+                st.session_state.job_profile = job.profile.report()
+                processed = st.session_state.result_key[0] == digest
                 st.success(
                     f"Processing complete. {len(cleaned_df)} rows retained; {len(removed_rows)} rows removed."
                 )
+                # The lead index version is part of the key only when duplicates were checked
+                if st.session_state.job_key[2] is not None:
+                    duplicates = reasons.get(dict(REASON_LABELS)[REASON_ALREADY_UPLOADED], 0)
+                    st.info(f"{duplicates} of the removed rows were already uploaded.")
 
         # If already processed, display the download buttons
         if processed:
-            # Retrieve processed data from session state
-            cleaned_df = st.session_state.cleaned_df
-            removed_rows = st.session_state.removed_rows
-
-            # Convert DataFrames to XLSX bytes
-            xlsx_cleaned = to_xlsx(cleaned_df)
-            xlsx_removed = to_xlsx(removed_rows)
-
-            st.download_button(
-                label="Download Processed File",
-                data=xlsx_cleaned,
-                file_name=output_file_name,
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            )
-            st.download_button(
-                label="Download Removed Rows File",
-                data=xlsx_removed,
-                file_name=removed_file_name,
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            )
+            # Retrieve processed data from session state. Changing the Location Name
+            # afterwards only rewrites that column of the files.
+            base_cleaned = st.session_state.cleaned_df
+            base_removed = st.session_state.removed_rows
+            result_key = st.session_state.result_key
+            result_split = st.session_state.get("result_split")
+            cleaned_df, removed_rows = located_frames(base_cleaned, base_removed, location_name, result_key[3])
+            show_reasons(st.session_state.get("reasons", {}))
+            show_email_typos(st.session_state.get("email_typos", {}))
+
+            if result_split:
+                # One ZIP with a folder per location, built once per result and Location
+                # Name; a new Location Name rebuilds it in the background
+                zip_key = result_key + ('zip', result_split, location_name)
+                zip_data = EXPORT_CACHE.get(zip_key)
+                if zip_data is None:
+                    zip_job = RUNNER.get(st.session_state.get("zip_job_id"))
+                    if zip_job is None or st.session_state.get("zip_job_key") != zip_key:
+                        st.session_state.zip_job_id = RUNNER.submit(
+                            location_zip, result_key, base_cleaned, base_removed, location_name, result_split,
+                            result_key[3], rows_total=len(base_cleaned) + len(base_removed),
+                        )
+                        st.session_state.zip_job_key = zip_key
+                        zip_job = RUNNER.get(st.session_state.zip_job_id)
+                    if not zip_job.done:
+                        total = f" of {zip_job.rows_total:,}" if zip_job.rows_total else ""
+                        st.progress(zip_job.fraction, text=f"{zip_job.stage}: {zip_job.rows_done:,}{total} rows")
+                        time.sleep(POLL_SECONDS)
+                        st.rerun()
+                    elif zip_job.status == 'failed':
+                        st.error(zip_job.error)
+                    else:
+                        zip_data = zip_job.result
+                if zip_data is not None:
+                    st.download_button(
+                        label="Download Files by Location (ZIP)",
+                        data=zip_data,
+                        file_name=f"{os.path.splitext(output_file_name)[0]}_by_location.zip",
+                        mime="application/zip",
+                    )
+            else:
+                # Each file is written only when its button is clicked, once per result,
+                # Location Name and format; clicking both writes them side by side
+                st.download_button(
+                    label="Download Processed File",
+                    data=partial(export_output, result_key, 'cleaned', base_cleaned, cleaned_df, location_name,
+                                 export_format, result_key[3]),
+                    file_name=output_file_name,
+                    mime=EXPORT_TYPES[export_format],
+                )
+                st.download_button(
+                    label="Download Removed Rows File",
+                    data=partial(export_output, result_key, 'removed', base_removed, removed_rows, location_name,
+                                 export_format, result_key[3]),
+                    file_name=removed_file_name,
+                    mime=EXPORT_TYPES[export_format],
+                )
+
+            # Where the time went, for tracking down slow runs
+            with st.expander("Performance Profile"):
+                read_digest, read_report = st.session_state.get("read_profile", (None, None))
+                if read_digest == digest:
+                    show_profile("Reading the upload", read_report)
+                show_profile("Processing and export", st.session_state.job_profile)
+
+            # Remember these leads so the next upload can skip them
+            if st.button("Mark These Leads as Uploaded"):
+                added = shared_index().record(cleaned_df)
+                st.success(f"Recorded {added} new emails and phone numbers.")
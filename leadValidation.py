@@ -0,0 +1,284 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from leadRules import (FORBIDDEN_PREFIXES, NANP_AREA_CODES, PHONE_FORMAT, PHONE_REGEX, REASON_FORBIDDEN_PREFIX,
+                       REASON_INVALID_PHONE, REASON_UNKNOWN_AREA_CODE, cell_text, is_valid_email, is_valid_phone,
+                       normalize_phone, phone_digits)
+
+# Whether each three-digit area code is in service, indexed by the code
+AREA_CODE_TABLE = np.zeros(1000, dtype=bool)
+AREA_CODE_TABLE[[int(code) for code in NANP_AREA_CODES]] = True
+
+# --------------------------------------------------
+# Columnar Checks
+# --------------------------------------------------
+
+# The columnar checks run on Arrow string arrays, whose regex engine (RE2) only
+# treats ASCII as digits/whitespace and anchors `$` at the very end. These
+# patterns spell out the ASCII characters `re` accepts, and values where the
+# two engines could disagree are sent to the scalar checks instead.
+_EMAIL_PATTERN = r'^[a-zA-Z0-9._%+\-]+@[a-zA-Z0-9.\-]+\.[a-zA-Z]{2,}$'
+_PHONE_PATTERN = r'^\+?[0-9\t\n\x0b\x0c\r\x1c-\x1f \-().]{10,15}$'
+
+# Characters removed by str.strip()
+_WHITESPACE = (
+    '\t\n\x0b\x0c\r\x1c\x1d\x1e\x1f \x85\xa0\u1680\u2000\u2001\u2002\u2003\u2004'
+    '\u2005\u2006\u2007\u2008\u2009\u200a\u2028\u2029\u202f\u205f\u3000'
+)
+
+def _is_arrow_string(array) -> bool:
+    return pa.types.is_string(array.type) or pa.types.is_large_string(array.type)
+
+def _arrow_strings(values):
+    """
+    Converts values to an Arrow string array aligned with the input, with
+    nulls for anything that is not a string. Returns (strings, others), where
+    `others` maps positions to objects only the scalar check can decide: any
+    value that is not a string, missing value or float (ints, bools, ...).
+
+    String-typed columns convert without copying; mixed object columns are
+    sorted value by value.
+    """
+    try:
+        strings = pa.array(values, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        strings = None
+    if isinstance(strings, pa.ChunkedArray):
+        strings = strings.combine_chunks()
+    if strings is not None and _is_arrow_string(strings):
+        return strings, {}
+    if strings is not None and pa.types.is_null(strings.type):
+        return pa.nulls(len(strings), pa.string()), {}
+
+    values = values.to_numpy(dtype=object) if isinstance(values, pd.Series) else np.asarray(values, dtype=object)
+    present = ~pd.isna(values)
+    is_str = np.zeros(len(values), dtype=bool)
+    is_str[present] = [isinstance(v, str) for v in values[present]]
+    others = {i: values[i] for i in np.flatnonzero(present & ~is_str) if not isinstance(values[i], float)}
+    return pa.array(np.where(is_str, values, None), type=pa.string()), others
+
+def _matches(strings: pa.Array, pattern: str) -> np.ndarray:
+    matched = pc.match_substring_regex(strings, pattern)
+    return pc.fill_null(matched, False).to_numpy(zero_copy_only=False)
+
+def _decide(strings: pa.Array, string_check, scalar_check) -> np.ndarray:
+    """
+    Runs `string_check` over the whole array at once and `scalar_check` only
+    for the few values the columnar path leaves undecided: non-ASCII strings
+    and strings ending in a newline (where `$` also matches).
+    """
+    simple = pc.and_(pc.string_is_ascii(strings), pc.invert(pc.ends_with(strings, '\n')))
+    simple = pc.fill_null(simple, False).to_numpy(zero_copy_only=False)
+    present = pc.is_valid(strings).to_numpy(zero_copy_only=False)
+
+    mask = string_check(strings) & simple
+    for i in np.flatnonzero(present & ~simple):
+        mask[i] = scalar_check(strings[int(i)].as_py())
+    return mask
+
+def _columnar_mask(values, string_check, scalar_check, counts: dict = None) -> np.ndarray:
+    """
+    Validates each distinct string once and maps the results back to every
+    row. Non-string objects always go through `scalar_check`.
+    If `counts` is given, its 'values' and 'distinct' entries are increased by
+    the number of values present and the number actually validated.
+    """
+    strings, others = _arrow_strings(values)
+    encoded = pc.dictionary_encode(strings)
+    codes = pc.fill_null(encoded.indices, -1).to_numpy(zero_copy_only=False)
+    unique_mask = _decide(encoded.dictionary, string_check, scalar_check)
+    if counts is not None:
+        counts['values'] = counts.get('values', 0) + len(strings) - strings.null_count + len(others)
+        counts['distinct'] = counts.get('distinct', 0) + len(encoded.dictionary) + len(others)
+
+    mask = np.zeros(len(codes), dtype=bool)
+    present = codes >= 0
+    mask[present] = unique_mask[codes[present]]
+    for i, value in others.items():
+        mask[i] = scalar_check(value)
+    return mask
+
+def _email_strings_valid(strings: pa.Array) -> np.ndarray:
+    return _matches(strings, _EMAIL_PATTERN)
+
+def _string_bytes(strings: pa.Array) -> (np.ndarray, np.ndarray):
+    """Returns the offsets and the UTF-8 bytes of an Arrow string array, without copying."""
+    if strings.offset:
+        strings = pa.concat_arrays([strings])
+    _, offsets, data = strings.buffers()
+    offsets = np.frombuffer(offsets, dtype=np.int64 if pa.types.is_large_string(strings.type) else np.int32,
+                            count=len(strings) + 1)
+    data = np.frombuffer(data, dtype=np.uint8, count=int(offsets[-1])) if data is not None else np.zeros(0, np.uint8)
+    return offsets.astype(np.int64), data
+
+def _phone_digits(strings: pa.Array) -> (np.ndarray, np.ndarray, np.ndarray, np.ndarray):
+    """
+    Columnar `phone_digits` for ASCII strings, on the raw string bytes. Returns a tuple:
+        (the ASCII digits of every string, concatenated;
+         offsets of each string's digits in them (one more than there are strings);
+         start and length of each string's `phone_digits` in them)
+    """
+    offsets, data = _string_bytes(strings)
+    is_digit = (data - np.uint8(ord('0'))) < 10
+    # One byte of padding, so reads just past the last digit stay in bounds
+    digits = np.append(data[np.flatnonzero(is_digit)], np.uint8(ord('0')))
+    digits_through = np.cumsum(is_digit, dtype=np.int64)
+    digit_offsets = np.where(offsets > 0, digits_through[np.maximum(offsets - 1, 0)], 0) if len(data) else offsets * 0
+    lengths = np.diff(digit_offsets)
+    drop_one = (lengths > 10) & (digits[digit_offsets[:-1]] == ord('1'))
+    return digits, digit_offsets, digit_offsets[:-1] + drop_one, lengths - drop_one
+
+def _digit_at(digits: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    return digits[np.minimum(positions, len(digits) - 1)].astype(np.int16) - ord('0')
+
+def _starts_with_any(digits: np.ndarray, starts: np.ndarray, lengths: np.ndarray, prefixes: tuple) -> np.ndarray:
+    found = np.zeros(len(starts), dtype=bool)
+    for prefix in prefixes:
+        match = lengths >= len(prefix)
+        for i, digit in enumerate(prefix):
+            match &= _digit_at(digits, starts + i) == int(digit)
+        found |= match
+    return found
+
+def _area_code_known(digits: np.ndarray, starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """True for numbers that are not 10 digits long or whose area code is in AREA_CODE_TABLE."""
+    area = _digit_at(digits, starts) * 100 + _digit_at(digits, starts + 1) * 10 + _digit_at(digits, starts + 2)
+    return (lengths != 10) | AREA_CODE_TABLE[area]
+
+def _phone_strings_valid(strings: pa.Array, prefixes: tuple) -> np.ndarray:
+    valid = _matches(strings, _PHONE_PATTERN)
+    digits, _, starts, lengths = _phone_digits(strings)
+    if prefixes:
+        valid &= ~_starts_with_any(digits, starts, lengths, prefixes)
+    return valid & _area_code_known(digits, starts, lengths)
+
+def valid_email_mask(values, counts: dict = None) -> np.ndarray:
+    """
+    Columnar equivalent of `is_valid_email`. Each distinct value is checked
+    once; `counts`, if given, adds up values and distinct values checked.
+    Returns a boolean NumPy array with one entry per value.
+    """
+    return _columnar_mask(values, _email_strings_valid, is_valid_email, counts)
+
+def valid_phone_mask(values, counts: dict = None) -> np.ndarray:
+    """
+    Columnar equivalent of `is_valid_phone`. Each distinct value is checked
+    once; `counts`, if given, adds up values and distinct values checked.
+    Returns a boolean NumPy array with one entry per value.
+    """
+    return _columnar_mask(values, lambda strings: _phone_strings_valid(strings, FORBIDDEN_PREFIXES), is_valid_phone,
+                          counts)
+
+def misspelled_emails(values, checker) -> (np.ndarray, list, dict):
+    """
+    Finds the emails whose domain `checker` (a leadDomains.DomainChecker)
+    takes for a misspelling. `values` must hold only valid emails (see
+    `valid_email_mask`) or missing values. Each distinct domain is checked
+    once, so the work grows with the number of domains rather than rows.
+    Returns a tuple:
+        (positions of those emails, the emails with the suggested domain,
+         {misspelled domain: suggested domain})
+    """
+    strings, _ = _arrow_strings(values)
+    # Valid emails have exactly one '@'
+    domains = pc.dictionary_encode(pc.list_element(pc.split_pattern(strings, '@', max_splits=1), 1))
+    unique_domains = domains.dictionary.to_pylist()
+    suggestions = [checker.suggestion(domain) for domain in unique_domains]
+    misspelled = np.array([suggestion is not None for suggestion in suggestions] + [False])
+    if not misspelled.any():
+        return np.zeros(0, dtype=np.int64), [], {}
+
+    codes = pc.fill_null(domains.indices, -1).to_numpy(zero_copy_only=False)
+    positions = np.flatnonzero(misspelled[codes])
+    corrected = [checker.corrected_email(email) for email in strings.take(positions).to_pylist()]
+    found = {domain: suggestion for domain, suggestion in zip(unique_domains, suggestions)
+             if suggestion is not None}
+    return positions, corrected, found
+
+def _has_phone_format(phone) -> bool:
+    return isinstance(phone, str) and bool(PHONE_REGEX.match(phone))
+
+def _has_forbidden_prefix(phone) -> bool:
+    return isinstance(phone, str) and phone_digits(phone).startswith(FORBIDDEN_PREFIXES)
+
+def phone_reasons(values) -> np.ndarray:
+    """
+    Columnar `leadRules.phone_reason`, for values `valid_phone_mask` rejects:
+    a bad format, a forbidden prefix, or otherwise an area code not in service.
+    Returns a uint8 NumPy array of reason bits with one entry per value.
+    """
+    has_format = _columnar_mask(values, lambda strings: _matches(strings, _PHONE_PATTERN), _has_phone_format)
+    def forbidden_check(strings):
+        digits, _, starts, lengths = _phone_digits(strings)
+        return _starts_with_any(digits, starts, lengths, FORBIDDEN_PREFIXES)
+    forbidden = _columnar_mask(values, forbidden_check, _has_forbidden_prefix)
+    return np.where(~has_format, REASON_INVALID_PHONE,
+                    np.where(forbidden, REASON_FORBIDDEN_PREFIX, REASON_UNKNOWN_AREA_CODE)).astype(np.uint8)
+
+def _join_digits(digits: np.ndarray, digit_offsets: np.ndarray, skip_one: np.ndarray, plus: np.ndarray,
+                 one: np.ndarray) -> pa.Array:
+    """
+    Builds a string per row from its digits (see `_phone_digits`), without the
+    first digit where `skip_one` is set, after a '+' where `plus` is set and a
+    '1' after that where `one` is set. The bytes are moved with NumPy.
+    """
+    digits = np.delete(digits[:digit_offsets[-1]], digit_offsets[:-1][skip_one])
+    offsets = digit_offsets - np.concatenate([[0], np.cumsum(skip_one)])
+    # Inserted in this order, so a '+' lands before a '1' at the same position
+    positions = np.concatenate([offsets[:-1][plus], offsets[:-1][one]])
+    values = np.concatenate([np.full(plus.sum(), ord('+'), np.uint8), np.full(one.sum(), ord('1'), np.uint8)])
+    data = np.insert(digits, positions, values)
+    offsets = offsets + np.concatenate([[0], np.cumsum(plus.astype(np.int64) + one)])
+    return pa.Array.from_buffers(pa.large_string(), len(skip_one), [None, pa.py_buffer(offsets), pa.py_buffer(data)])
+
+def _normalized_strings(strings: pa.Array, phone_format: str) -> pa.Array:
+    """Columnar `normalize_phone` for ASCII strings."""
+    digits, digit_offsets, starts, lengths = _phone_digits(strings)
+    ten_digits = lengths == 10
+    # NANP numbers keep only their national digits; others keep all of them
+    skip_one = ten_digits & (starts > digit_offsets[:-1])
+    if phone_format == 'digits':
+        no = np.zeros(len(lengths), dtype=bool)
+        return _join_digits(digits, digit_offsets, skip_one, no, no)
+    plus = ten_digits | pc.fill_null(pc.starts_with(strings, '+'), False).to_numpy(zero_copy_only=False)
+    return _join_digits(digits, digit_offsets, skip_one, plus, ten_digits)
+
+def normalized_phones(series: pd.Series, valid: np.ndarray, phone_format: str = PHONE_FORMAT) -> pd.Series:
+    """
+    Writes the valid numbers of a phone column (see `phone_strings`) in one of
+    leadRules.PHONE_FORMATS and blanks the rest. The whole column is rewritten
+    at once on its raw bytes; only non-ASCII numbers go through
+    `normalize_phone` one by one.
+    """
+    if phone_format == 'original':
+        return series.where(valid, None)
+    strings, _ = _arrow_strings(series)
+    normalized = _normalized_strings(strings, phone_format)
+
+    others = np.flatnonzero(valid & ~pc.fill_null(pc.string_is_ascii(strings), True).to_numpy(zero_copy_only=False))
+    if len(others):
+        values = normalized.to_numpy(zero_copy_only=False)
+        values[others] = [normalize_phone(strings[int(i)].as_py(), phone_format) for i in others]
+        normalized = pa.array(values, type=pa.large_string())
+
+    normalized = pc.if_else(pa.array(valid, type=pa.bool_()), normalized, pa.scalar(None, pa.large_string()))
+    return pd.Series(pd.arrays.ArrowStringArray(normalized), index=series.index)
+
+def phone_strings(series: pd.Series) -> pd.Series:
+    """
+    Converts a phone column to stripped strings, keeping missing values missing.
+    Numbers are written as leadRules.cell_text writes them, so a digits-only
+    column that pandas read as floats (because of a blank cell) keeps its
+    numbers: 5128675309.0 becomes '5128675309', not '5128675309.0'.
+    Stored as Arrow-backed strings so the phone checks can read them without a copy.
+    """
+    present = series.notna().to_numpy()
+    strings, _ = _arrow_strings(series)
+    if len(strings) - strings.null_count != present.sum():
+        values = series.to_numpy(dtype=object)
+        strings = pa.array([cell_text(v) if keep else None for v, keep in zip(values, present)], type=pa.string())
+
+    stripped = pc.utf8_trim(strings, characters=_WHITESPACE)
+    return pd.Series(pd.arrays.ArrowStringArray(stripped), index=series.index)
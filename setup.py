@@ -7,5 +7,6 @@ setup(
     install_requires=[
         "streamlit",
         "pandas",
+        "pyarrow",
     ],
 )
\ No newline at end of file
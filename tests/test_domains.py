@@ -0,0 +1,43 @@
+import pandas as pd
+import pytest
+
+import leadCleaning
+from leadCleaning import clean_leads
+from leadDomains import DomainChecker, is_real_suffix
+
+# Real provider domains that are one or two edits from another listed domain
+NOT_TYPOS = [
+    'outlook.de', 'protonmail.ch', 'yahoo.com.br', 'yahoo.co.jp', 'yahoo.ie', 'yahoo.in', 'hotmail.nl',
+    'hotmail.be', 'cloud.com', 'hotmail.dk', 'yahoo.com.tw', 'outlook.net',
+]
+
+TYPOS = {
+    'gmial.com': 'gmail.com', 'yaho.com': 'yahoo.com', 'gmail.con': 'gmail.com', 'gmail.co': 'gmail.com',
+    'gmail.cm': 'gmail.com', 'yahoo.cmo': 'yahoo.com', 'hotmial.co.uk': 'hotmail.co.uk', 'hotmail.comm': 'hotmail.com',
+}
+
+@pytest.mark.parametrize('domain', NOT_TYPOS)
+def test_real_domains_are_not_typos(domain):
+    assert DomainChecker().suggestion(domain) is None
+
+@pytest.mark.parametrize('domain, suggestion', TYPOS.items())
+def test_typos_are_suggested(domain, suggestion):
+    assert DomainChecker().suggestion(domain) == suggestion
+
+@pytest.mark.parametrize('suffix, real', [
+    ('com', True), ('de', True), ('co.uk', True), ('com.br', True), ('co.jp', True),
+    ('con', False), ('co', False), ('cm', False), ('comm', False), ('com.con', False), ('a.b.uk', False),
+])
+def test_is_real_suffix(suffix, real):
+    assert is_real_suffix(suffix) is real
+
+@pytest.mark.parametrize('action, email', [
+    ('flag', 'jane@gmial.com'), ('correct', 'jane@gmail.com'), ('remove', ''), ('ignore', 'jane@gmial.com'),
+])
+def test_email_typo_actions(monkeypatch, action, email):
+    monkeypatch.setattr(leadCleaning, 'EMAIL_TYPOS', action)
+    leads = pd.DataFrame({'First Name': ['Jane', 'John'], 'Last Name': ['Doe', 'Roe'],
+                          'Email': ['jane@gmial.com', 'john@hotmail.nl'], 'Mobile Phone': ['5128675309', None]})
+    cleaned, _, diagnostics = clean_leads(leads, '')
+    assert cleaned['Email'].fillna('').tolist() == [email, 'john@hotmail.nl']
+    assert diagnostics['email_typos'] == ({} if action == 'ignore' else {'gmial.com': 'gmail.com'})
@@ -0,0 +1,90 @@
+import zipfile
+from io import BytesIO
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from leadCleaning import stream_file
+from leadIO import XLSX_SHEET, frame_to_xlsx, frame_writer, read_csv_frame, xlsx_with_column
+
+def read_output(path: str, output_format: str) -> pd.DataFrame:
+    if output_format == 'parquet':
+        return pd.read_parquet(path)
+    with pa.memory_map(path) as source:
+        return pa.ipc.open_file(source).read_pandas()
+
+@pytest.mark.parametrize('output_format', ['parquet', 'arrow'])
+def test_column_blank_in_first_chunk(tmp_path, output_format):
+    # Notes is blank in the whole first chunk, and the removed rows' first chunk has no rows
+    leads = pd.DataFrame({
+        'First Name': [f'Lead {i}' for i in range(12)],
+        'Last Name': ['Doe'] * 12,
+        'Email': [f'lead{i}@gmail.com' if i < 10 else 'not an email' for i in range(12)],
+        'Notes': [None] * 6 + [f'note {i}' for i in range(6, 12)],
+    })
+    leads.to_excel(tmp_path / 'leads.xlsx', index=False)
+    cleaned, removed = tmp_path / f'cleaned.{output_format}', tmp_path / f'removed.{output_format}'
+
+    assert stream_file(str(tmp_path / 'leads.xlsx'), str(cleaned), str(removed), 'Club One', chunk_size=4,
+                       output_format=output_format) == (10, 2)
+    cleaned_df = read_output(str(cleaned), output_format)
+    assert cleaned_df['Notes'].isna().sum() == 6
+    assert cleaned_df['Notes'].dropna().tolist() == ['note 6', 'note 7', 'note 8', 'note 9']
+    assert read_output(str(removed), output_format)['Notes'].tolist() == ['note 10', 'note 11']
+
+@pytest.mark.parametrize('output_format', ['parquet', 'arrow'])
+def test_empty_first_chunk(tmp_path, output_format):
+    path = str(tmp_path / f'out.{output_format}')
+    chunk = pd.DataFrame({'First Name': ['Jane'], 'Removal Reason': ['Invalid email']})
+    with frame_writer(path, output_format) as writer:
+        writer.write(chunk.iloc[:0].astype(object))
+        writer.write(chunk)
+    assert read_output(path, output_format).to_dict('records') == chunk.to_dict('records')
+
+@pytest.mark.parametrize('data', [
+    # A row with too few fields, which pandas pads with missing values
+    b"First Name,Last Name,Email,Mobile Phone,Notes\nJane,Doe,jane@gmail.com,5128675309,x\nJohn,Roe,john@gmail.com\n",
+    b"First Name,Email,Email,\nJane,jane@gmail.com,j@gmail.com,x\n",
+    b"First Name,Notes\nJane,\"two\nlines\"\n\nJohn,\n",
+    b"First Name,Mobile Phone\nJane,5128675309\nJohn,\n",
+    b"First Name,Last Name\n",
+], ids=['short row', 'repeated and blank names', 'newline in value', 'number column', 'no rows'])
+def test_read_csv_frame_matches_pandas(data):
+    expected = pd.read_csv(BytesIO(data))
+    pd.testing.assert_frame_equal(read_csv_frame(BytesIO(data)), expected)
+
+def sheet_xml(xlsx: bytes) -> bytes:
+    # The workbook's other parts hold the time it was written
+    with zipfile.ZipFile(BytesIO(xlsx)) as archive:
+        return archive.read(XLSX_SHEET)
+
+def frame_with(frame: pd.DataFrame, column: str, values) -> pd.DataFrame:
+    frame = frame.copy()
+    frame[column] = values
+    return frame
+
+LEADS = pd.DataFrame({
+    'Location Name': ['North', None, 'North', '', 'South & East'],
+    'First Name': ['Jane', 'John', None, 'Ann', 'Bo'],
+    'Email': ['jane@gmail.com', None, None, None, 'bo@gmail.com'],
+    'Notes': [None, 'a < b', None, None, '"quoted" & <tagged>'],
+})
+
+@pytest.mark.parametrize('column', ['Location Name', 'Email', 'Notes'])
+@pytest.mark.parametrize('values', [
+    'Club One', 'Smith & Sons <HQ>', '', None,
+    ['A', 'B & C', None, '<d>', ''], [None] * 5, ['x'] * 5,
+], ids=['constant', 'constant escaped', 'constant empty', 'constant missing',
+        'per row', 'per row missing', 'per row same'])
+def test_xlsx_with_column_matches_fresh_write(column, values):
+    patched = xlsx_with_column(frame_to_xlsx(LEADS), LEADS.columns.get_loc(column), values)
+    assert sheet_xml(patched) == sheet_xml(frame_to_xlsx(frame_with(LEADS, column, values)))
+
+def test_xlsx_with_column_fills_empty_rows():
+    # Rows with no cells at all, before and after the target column
+    leads = pd.DataFrame({'Location Name': [None, None, 'West'], 'First Name': [None, 'Jo', None]})
+    for index, column in enumerate(leads.columns):
+        for values in ('Club One', ['A', None, 'C']):
+            patched = xlsx_with_column(frame_to_xlsx(leads), index, values)
+            assert sheet_xml(patched) == sheet_xml(frame_to_xlsx(frame_with(leads, column, values)))
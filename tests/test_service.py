@@ -0,0 +1,137 @@
+import os
+import threading
+import time
+from io import BytesIO
+
+import pandas as pd
+import pytest
+
+import leadService
+from leadService import LeadService, ServiceClient, make_app
+
+LEADS_CSV = (
+    "First Name,Last Name,Email,Mobile Phone,Notes\n"
+    "Jane,Doe,jane.doe@gmail.com,(512) 867-5309,\n"
+    "John,Roe,,+1 512 555 0199,called\n"
+    "Bad,Lead,bad@gmail,800-555-1234,\n"
+)
+
+# Seconds a test waits for a job before giving up
+JOB_TIMEOUT = 30
+
+@pytest.fixture
+def leads_file(tmp_path):
+    path = tmp_path / 'leads.csv'
+    path.write_text(LEADS_CSV, encoding='utf-8')
+    return str(path)
+
+def service_client(tmp_path, **kwargs) -> (LeadService, ServiceClient):
+    service = LeadService(str(tmp_path / 'work'), **kwargs)
+    return service, ServiceClient(make_app(service))
+
+def wait_for(client: ServiceClient, job_id: str) -> dict:
+    deadline = time.monotonic() + JOB_TIMEOUT
+    while time.monotonic() < deadline:
+        status = client.get(f'/jobs/{job_id}').json()
+        if status['status'] in ('done', 'failed'):
+            return status
+        time.sleep(0.05)
+    raise AssertionError(f"Job {job_id} did not finish in {JOB_TIMEOUT}s")
+
+@pytest.fixture
+def blocked_jobs(monkeypatch):
+    """Holds every service job until the returned event is set."""
+    release = threading.Event()
+    run_upload = leadService.run_upload
+    def held_upload(job, *args, **kwargs):
+        release.wait(JOB_TIMEOUT)
+        return run_upload(job, *args, **kwargs)
+    monkeypatch.setattr(leadService, 'run_upload', held_upload)
+    yield release
+    release.set()
+
+def test_upload_clean_and_download(tmp_path, leads_file):
+    service, client = service_client(tmp_path)
+    assert client.get('/health').json() == {'status': 'ok'}
+
+    response = client.upload(leads_file, 'Club One')
+    assert response.status == 202
+    job_id = response.json()['job_id']
+    assert response.headers['Location'] == f'/jobs/{job_id}'
+
+    status = wait_for(client, job_id)
+    assert status['status'] == 'done', status['error']
+    assert (status['rows_retained'], status['rows_removed']) == (2, 1)
+    assert status['downloads'] == {'cleaned': f'/jobs/{job_id}/cleaned', 'removed': f'/jobs/{job_id}/removed'}
+
+    cleaned = client.get(f'/jobs/{job_id}/cleaned?format=csv')
+    assert cleaned.status == 200
+    assert cleaned.headers['Content-Type'].startswith('text/csv')
+    assert cleaned.headers['Content-Disposition'].endswith("leads_cleaned.csv")
+    cleaned_df = pd.read_csv(BytesIO(cleaned.body), dtype=str)
+    assert cleaned_df['First Name'].tolist() == ['Jane', 'John']
+    assert set(cleaned_df['Location Name']) == {'Club One'}
+
+    removed_df = pd.read_excel(BytesIO(client.get(f'/jobs/{job_id}/removed').body), dtype=str)
+    assert removed_df['First Name'].tolist() == ['Bad']
+    assert removed_df['Removal Reason'].notna().all()
+
+    parquet = client.get(f'/jobs/{job_id}/cleaned?format=parquet')
+    assert pd.read_parquet(BytesIO(parquet.body))['Email'].tolist()[0] == 'jane.doe@gmail.com'
+
+    metrics = client.get('/metrics').json()
+    assert (metrics['uploads'], metrics['done'], metrics['queue_depth']) == (1, 1, 0)
+
+    assert client.delete(f'/jobs/{job_id}').json() == {'job_id': job_id, 'deleted': True}
+    assert client.get(f'/jobs/{job_id}').status == 404
+    assert os.listdir(service.work_dir) == []
+
+def test_busy_service_rejects_uploads(tmp_path, leads_file, blocked_jobs):
+    _, client = service_client(tmp_path, workers=1, max_queued=1)
+    running = client.upload(leads_file).json()['job_id']
+    queued = client.upload(leads_file).json()['job_id']
+
+    rejected = client.upload(leads_file)
+    assert rejected.status == 429
+    assert rejected.headers['Retry-After'] == str(leadService.RETRY_AFTER_SECONDS)
+    metrics = client.get('/metrics').json()
+    assert (metrics['queue_depth'], metrics['rejected'], metrics['uploads']) == (2, 1, 2)
+
+    # Outputs and deletes wait for the job to finish
+    assert client.get(f'/jobs/{running}/cleaned').status == 409
+    assert client.delete(f'/jobs/{running}').status == 409
+
+    blocked_jobs.set()
+    assert wait_for(client, running)['status'] == 'done'
+    assert wait_for(client, queued)['status'] == 'done'
+    assert client.upload(leads_file).status == 202
+
+@pytest.mark.parametrize('method, path, body, status', [
+    ('POST', '/jobs?file_name=leads.txt', b'abc', 415),
+    ('POST', '/jobs?file_name=leads.csv', b'', 400),
+    ('POST', '/jobs', b'abc', 400),
+    ('GET', '/jobs', b'', 405),
+    ('GET', '/jobs/' + '0' * 32, b'', 404),
+    ('GET', '/jobs/' + '0' * 32 + '/cleaned', b'', 404),
+    ('DELETE', '/jobs/' + '0' * 32, b'', 404),
+    ('GET', '/jobs/not-a-job', b'', 404),
+])
+def test_bad_requests(tmp_path, method, path, body, status):
+    _, client = service_client(tmp_path)
+    response = client.request(method, path, body)
+    assert response.status == status
+    assert response.json()['error']
+
+def test_unknown_output_and_format(tmp_path, leads_file):
+    _, client = service_client(tmp_path)
+    job_id = client.upload(leads_file).json()['job_id']
+    wait_for(client, job_id)
+    assert client.get(f'/jobs/{job_id}/everything').status == 404
+    assert client.get(f'/jobs/{job_id}/cleaned?format=json').status == 400
+
+def test_failed_job_reports_error(tmp_path):
+    _, client = service_client(tmp_path)
+    job_id = client.post('/jobs?file_name=leads.csv', b'First Name,Email\nJane,jane@gmail.com\n').json()['job_id']
+    status = wait_for(client, job_id)
+    assert status['status'] == 'failed'
+    assert 'Last Name' in status['error']
@@ -0,0 +1,87 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from leadCleaning import clean_leads
+from leadRules import FORBIDDEN_PREFIXES, is_valid_email, is_valid_phone
+from leadValidation import phone_strings, valid_email_mask, valid_phone_mask
+
+# The columnar masks must agree with the scalar checks on every value,
+# including the ones the Arrow regex engine reads differently from `re`
+
+EMAILS = [
+    'jane.doe@example.com', 'A.B+tag@sub-domain.example.org', 'jane@example', 'jane@example.c', '@example.com',
+    'jane doe@example.com', ' jane@example.com', '', None, np.nan,
+    # A trailing newline, which `$` matches before
+    'jane@example.com\n', 'jane@example.com\n\n', '\njane@example.com',
+    # Non-ASCII letters and digits
+    'jöhn@example.com', 'john@exämple.com', '١٢٣@example.com', 'jane＠example.com', 'jane@example.ｃｏｍ',
+]
+
+PHONES = [
+    '(512) 867-5309', '512.867.5309', '+1 512 867 5309', '5128675309', '512-867-530', '512867530912345678',
+    '+44 20 7946 0958', 'call 5128675309', '000-000-0000', '0', '', None, np.nan,
+    # A trailing newline
+    '5128675309\n', '(512) 867-5309\n', '\n5128675309',
+    # Non-ASCII digits: full-width, Arabic-Indic and Devanagari, alone and mixed with ASCII
+    '５１２８６７５３０９', '٥١٢٨٦٧٥٣٠٩', '५१२८६७५३०९', '512-867-５３０９', '+１ ５１２ ８６７ ５３０９', '８００５５５１２３４',
+    # 11 digits starting with '1', which count as the 10-digit number after it
+    '15128675309', '1-512-867-5309', '+15128675309', '11234567890', '10005551234', '1 (999) 867-5309',
+    '115128675309', '25128675309',
+]
+
+# Each forbidden prefix as a 10-digit number, after a NANP '1' and in other layouts
+PHONES += [phone for prefix in FORBIDDEN_PREFIXES for phone in (
+    f'{prefix}5551234', f'1{prefix}5551234', f'+1 ({prefix}) 555-1234', f'{prefix}-555-1234\n',
+    f'{prefix}55512345', '１' + ''.join(chr(ord(d) + 0xfee0) for d in f'{prefix}5551234'),
+)]
+
+def containers(values: list) -> list:
+    """The values as the cleaning code may pass them: a list, an object column and a string column."""
+    return [list(values), pd.Series(values, dtype=object), pd.Series(values, dtype='str')]
+
+@pytest.mark.parametrize('values', containers(EMAILS * 2), ids=['list', 'object', 'str'])
+def test_email_mask_matches_scalar_check(values):
+    expected = [is_valid_email(value) for value in EMAILS * 2]
+    assert valid_email_mask(values).tolist() == expected
+
+@pytest.mark.parametrize('values', containers(PHONES * 2), ids=['list', 'object', 'str'])
+def test_phone_mask_matches_scalar_check(values):
+    expected = [is_valid_phone(value) for value in PHONES * 2]
+    assert valid_phone_mask(values).tolist() == expected
+
+@pytest.mark.parametrize('prefix', FORBIDDEN_PREFIXES)
+def test_forbidden_prefixes_rejected(prefix):
+    values = [f'{prefix}5551234', f'1{prefix}5551234', f'+1 ({prefix}) 555-1234']
+    assert not valid_phone_mask(values).any()
+    assert not any(is_valid_phone(value) for value in values)
+
+def test_missing_values_are_invalid():
+    for values in ([None, np.nan, pd.NA], pd.Series([None, None]), pd.Series([np.nan], dtype='str')):
+        assert not valid_email_mask(values).any()
+        assert not valid_phone_mask(values).any()
+
+def test_phone_strings_writes_whole_floats_as_integers():
+    # pandas reads a digits-only column with a blank cell as float64
+    phones = pd.read_csv(io.StringIO("Name,Mobile Phone\nA,5128675309\nB,12125550100\nC,\nD,5128675309.5\n"))
+    assert phones['Mobile Phone'].dtype == np.float64
+    strings = phone_strings(phones['Mobile Phone'])
+    assert strings.isna().tolist() == [False, False, True, False]
+    assert strings.dropna().tolist() == ['5128675309', '12125550100', '5128675309.5']
+
+def test_float_phone_column_normalizes_to_the_same_numbers():
+    csv = "First Name,Last Name,Email,Mobile Phone\nA,B,,5128675309\nC,D,,12125550100\nE,F,,\nG,H,,9995551234\n"
+    cleaned, removed, _ = clean_leads(pd.read_csv(io.StringIO(csv)), '')
+    assert cleaned['Mobile Phone'].tolist() == ['+15128675309', '+12125550100']
+    # 999 is not an area code in service
+    assert removed['First Name'].tolist() == ['E', 'G']
+
+def test_clean_leads_reports_distinct_values_validated():
+    leads = pd.DataFrame({'First Name': ['A', 'B', 'C', 'D'], 'Last Name': ['Z'] * 4,
+                          'Email': ['a@gmail.com', 'a@gmail.com', None, 'b@gmail'],
+                          'Mobile Phone': ['555-555-5555'] * 3 + [None]})
+    _, _, diagnostics = clean_leads([leads.iloc[:2], leads.iloc[2:]], '')
+    assert diagnostics['validation']['Email'] == {'values': 3, 'distinct': 2}
+    assert diagnostics['validation']['Mobile Phone'] == {'values': 3, 'distinct': 2}